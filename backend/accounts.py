@@ -0,0 +1,204 @@
+import random
+import sys
+import time
+from dataclasses import astuple, dataclass
+
+
+# ================== Records ==================
+
+@dataclass(slots=True)
+class Account:
+    id: int
+    name: str
+    dob: str           # dd-mm-yyyy, as entered
+    address: str
+    phone: str
+    email: str
+    account_type: str  # "savings" or "current"
+    pin_hash: str = ""  # see security.hash_pin
+
+
+class AccountError(ValueError):
+    pass
+
+
+class UnknownAccount(AccountError):
+    pass
+
+
+class DuplicateAccount(AccountError):
+    pass
+
+
+class InsufficientFunds(AccountError):
+    pass
+
+
+# ================== Account numbers ==================
+
+# Ten digits: a nine-digit sequence number (offset so numbers never start
+# with 0) and a Luhn check digit, so a mistyped number is rejected instead
+# of hitting someone else's account.
+ID_BASE = 100_000_000
+
+
+def _group_sum(group, double_first):
+    # Luhn contribution of a three-digit group (least significant digit first)
+    total = 0
+    for i in range(3):
+        group, d = divmod(group, 10)
+        if (i % 2 == 0) == double_first:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total
+
+
+# Sums per three-digit group, so a check digit is a few table lookups
+# rather than a loop over characters. Groups have odd length, so the
+# doubling parity flips from one group to the next.
+_DOUBLE_FIRST = [_group_sum(g, True) for g in range(1000)]
+_DOUBLE_SECOND = [_group_sum(g, False) for g in range(1000)]
+
+
+def luhn_digit(n):
+    total, table, other = 0, _DOUBLE_FIRST, _DOUBLE_SECOND
+    while n:
+        n, group = divmod(n, 1000)
+        total += table[group]
+        table, other = other, table
+    return -total % 10
+
+
+def account_number(seq):
+    body = ID_BASE + seq
+    return body * 10 + luhn_digit(body)
+
+
+def valid_account_number(number):
+    return number >= ID_BASE * 10 and luhn_digit(number // 10) == number % 10
+
+
+def normalize_phone(phone):
+    if phone.isdigit():
+        return phone
+    return "".join(ch for ch in phone if ch.isdigit())
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+# ================== Repository ==================
+
+class AccountRepository:
+    # Accounts indexed by number, phone and email (one dict each), so every
+    # lookup is a single hash probe. Phone and email are unique when given;
+    # empty values are simply not indexed.
+    def __init__(self):
+        self.by_id = {}
+        self.by_phone = {}
+        self.by_email = {}
+        self.next_seq = 1
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def new_id(self):
+        return account_number(self.next_seq)
+
+    def check_unique(self, phone, email):
+        phone, email = normalize_phone(phone), normalize_email(email)
+        if phone and phone in self.by_phone:
+            raise DuplicateAccount(f"phone {phone} already has an account")
+        if email and email in self.by_email:
+            raise DuplicateAccount(f"email {email} already has an account")
+
+    def add(self, account):
+        # The caller has run check_unique(); ids come from new_id()
+        self.by_id[account.id] = account
+        phone, email = normalize_phone(account.phone), normalize_email(account.email)
+        if phone:
+            self.by_phone[phone] = account
+        if email:
+            self.by_email[email] = account
+        self.next_seq = max(self.next_seq, account.id // 10 - ID_BASE + 1)
+        return account
+
+    def add_many(self, accounts):
+        # add() for a batch, with the index updates inlined
+        by_id, by_phone, by_email = self.by_id, self.by_phone, self.by_email
+        top = 0
+        for account in accounts:
+            by_id[account.id] = account
+            phone = account.phone if account.phone.isdigit() else normalize_phone(account.phone)
+            email = account.email.strip().lower()
+            if phone:
+                by_phone[phone] = account
+            if email:
+                by_email[email] = account
+            if account.id > top:
+                top = account.id
+        if top:
+            self.next_seq = max(self.next_seq, top // 10 - ID_BASE + 1)
+
+    def get(self, account_id):
+        try:
+            return self.by_id[account_id]
+        except KeyError:
+            raise UnknownAccount(f"no account {account_id}") from None
+
+    def find_by_phone(self, phone):
+        return self.by_phone.get(normalize_phone(phone))
+
+    def find_by_email(self, email):
+        return self.by_email.get(normalize_email(email))
+
+    # ---------- snapshots ----------
+    def to_state(self):
+        # Field tuples rather than dicts: about half the snapshot size
+        return {"next_seq": self.next_seq, "accounts": [astuple(a) for a in self.by_id.values()]}
+
+    @classmethod
+    def from_state(cls, state):
+        repo = cls()
+        for fields in state["accounts"]:
+            repo.add(Account(*fields))
+        repo.next_seq = state["next_seq"]
+        return repo
+
+
+# ================== Benchmark ==================
+
+def bench(total=10_000_000, probes=200_000):
+    # Lookup cost while the repository grows; it should stay flat. Memory is
+    # roughly 400 bytes per account, so 10M needs about 4 GB.
+    repo = AccountRepository()
+    checkpoints = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n < total] + [total]
+    rng = random.Random(1)
+    print(f"{'accounts':>12} {'by id':>10} {'by phone':>10} {'by email':>10}  (ns/lookup)")
+    for target in checkpoints:
+        for seq in range(len(repo) + 1, target + 1):
+            # Unique phone/email per account; shared strings for the rest
+            repo.add(Account(account_number(seq), "bench", "01-01-1990", "-",
+                             f"9{seq:09d}", f"user{seq}@example.com", "savings"))
+        sample = [rng.randint(1, target) for _ in range(probes)]
+        ids = [account_number(s) for s in sample]
+        phones = [f"9{s:09d}" for s in sample]
+        emails = [f"user{s}@example.com" for s in sample]
+        times = []
+        for lookup, keys in ((repo.get, ids), (repo.find_by_phone, phones),
+                             (repo.find_by_email, emails)):
+            start = time.perf_counter()
+            for key in keys:
+                lookup(key)
+            times.append((time.perf_counter() - start) / probes * 1e9)
+        print(f"{target:12,d} {times[0]:10.0f} {times[1]:10.0f} {times[2]:10.0f}")
+
+
+if __name__ == "__main__":
+    bench(*(int(a) for a in sys.argv[1:2]))
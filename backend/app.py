@@ -1,83 +1,196 @@
-import datetime
+import os
+from getpass import getpass
+
+import dates
+import onboard
+import security
+import storage
+from client import BankClient
+from ledger import to_cents
+from service import BankService, NewAccount, age
+
+
+#--------account storage (write-ahead log + snapshots)--------#
+DATA_DIR = os.environ.get("BANK_DATA_DIR",
+                          os.path.join(os.path.dirname(os.path.abspath(__file__)), "bank_data"))
+# set BANK_API_URL (e.g. http://127.0.0.1:8080) to use a running server.py
+API_URL = os.environ.get("BANK_API_URL", "")
+_store = None
+_guard = None
+_service = None
+
+def get_store():
+    # opened on first use, so importing this module touches no files
+    global _store
+    if _store is None:
+        _store = storage.AccountStore(DATA_DIR)
+    return _store
+
+def get_guard():
+    global _guard
+    if _guard is None:
+        _guard = security.PinGuard(get_store())
+    return _guard
+
+def get_service():
+    # the menus only talk to this: the bank in-process, or over HTTP
+    global _service
+    if _service is None:
+        _service = BankClient(API_URL) if API_URL else BankService(get_store(), get_guard())
+    return _service
+
+def read_int(prompt):
+    try:
+        return int(input(prompt))
+    except ValueError:
+        return None
+
+def read_amount(prompt):
+    try:
+        return to_cents(input(prompt))
+    except (ArithmeticError, ValueError):
+        return None
+
+def unavailable(exc):
+    # BankClient raises OSError (URLError included) when it can't reach the
+    # server; locally an OSError is a real disk problem and is re-raised
+    if not API_URL:
+        raise exc
+    print("server unavailable:", getattr(exc, "reason", exc))
+
+def login():
+    # account number + PIN; returns (account number, pin), or None
+    account_id=read_int("enter your account number")
+    if account_id is None:
+        print("invalid account number")
+        return None
+    pin=getpass("enter the pin")
+    try:
+        get_service().account_info(account_id, pin)
+    except storage.AccountError as exc:
+        print(exc)
+        return None
+    return account_id, pin
 
 
 #--------create a account in bank system--------#
-accounts=[]
 def create_account():
     
     name=input("enter your name:")
     dob=input("enter your date of birth")
-    dob_datetime = datetime.datetime.strptime(dob, "%d-%m-%Y")
-    today = datetime.date.today()
-    age = today.year - dob_datetime.year - (
-    (today.month, today.day) < (dob_datetime.month, dob_datetime.day)
-     )
+    try:
+        years = age(dob)
+    except storage.AccountError as exc:
+        print(exc)
+        return
   
-    if age<18:
+    if years<18:
         print("you are not eligible to create account")
         return
     address=input("enter your address:")
     phone=input("enter your phone number:")
     email=input("enter your mail id:")
     account_type=input("enter your account type(savings/current):")
-    intial_deposit=float(input("enter intial deposit amount:"))
-    if account_type.lower()=='savings' and intial_deposit<500:
-        print("minimum balance for savings account is 500")
+    intial_deposit=read_amount("enter intial deposit amount:")
+    if intial_deposit is None:
+        print("invalid amount")
+        return
+    pin=getpass("choose a pin (4-6 digits):")
+    try:
+        info = get_service().create_account(NewAccount(
+            name=name, dob=dob, address=address, phone=phone, email=email,
+            account_type=account_type, deposit_cents=intial_deposit, pin=pin))
+    except storage.DuplicateAccount as exc:
+        print("account already exists:", exc)
+        return
+    except storage.AccountError as exc:
+        print(exc)
         return
-    elif account_type.lower()=='current' and intial_deposit<1000:
-        print("min balnce for account is 1000")
-        return 
-    account={
-        'name':name,
-        'dob':dob_datetime,
-        'age':age,
-        'address':address,
-        'phone':phone,
-        'email':email,
-        'acccount_type':account_type,
-    }
-    accounts.append(account)
     print("account created successfully")
-def check_balance(account):
-    balance=1000000
-    correct_pin=685457
-    user=int(input("enter the pin"))
-    i=0
-    attempts=0
-    while i <3:
-        if user==correct_pin:
-            print("enter succesfully on your account")
-            print("current balance:",balance)
-        else:
-            print("invalid number")
-        if attempts==3:
-            print("soory sir")
-        
+    print("your account number:", info.account_id)
+def check_balance():
+    session=login()
+    if session is None:
+        return
+    print("enter succesfully on your account")
+    print("current balance:",get_service().check_balance(*session).amount)
+
 def withdraw_balance():
-    amount=int(input("enter the ammount withdraw"))
-    if amount>balance:
-        print("the balance invalid")
+    session=login()
+    if session is None:
+        return
+    amount=read_amount("enter the ammount withdraw")
+    if amount is None:
+        print("invalid amount")
+        return
+    try:
+        balance = get_service().withdraw(*session, amount)
+    except storage.AccountError as exc:
+        print("the balance invalid:", exc)
     else:
         print("the amount is withdraw")
-        balance -= amount
+        print("current balance:", balance.amount)
 
 def deposit_balance():
-    amount_deposit=int(input("enter the amount"))
-    balance += amount_deposit
-    print("the amounnt is deposited:",balance)
+    account_id=read_int("enter your account number")
+    amount_deposit=read_amount("enter the amount")
+    if account_id is None or amount_deposit is None:
+        print("invalid input")
+        return
+    try:
+        balance = get_service().deposit(account_id, amount_deposit)
+    except storage.AccountError as exc:
+        print("deposit failed:", exc)
+    else:
+        print("the amounnt is deposited:",balance.amount)
 
 def pin_change():
-    correct_pin=685457
-    new_pin=0
-    user=int(input("enter the pin"))
-    if user == correct_pin:
-        print("enter the new pin")
-        correct_pin==new_pin
-        print("the pin is updated")
+    account_id=read_int("enter your account number")
+    if account_id is None:
+        print("invalid account number")
+        return
+    old_pin=getpass("enter the pin")
+    new_pin=getpass("enter the new pin")
+    try:
+        get_service().change_pin(account_id, old_pin, new_pin)
+    except storage.AccountError as exc:
+        print(exc)
     else:
-        print("get lost")
-    
-    new_pin.append(correct_pin)
+        print("the pin is updated")
+
+def account_statement():
+    session=login()
+    if session is None:
+        return
+    today=dates.today()
+    try:
+        start=input("from date (dd-mm-yyyy, empty for the 1st of this month)")
+        start=dates.parse_date(start) if start else today.replace(day=1)
+        end=input("to date (dd-mm-yyyy, empty for today)")
+        end=dates.parse_date(end) if end else today
+    except ValueError:
+        print("dates must be dd-mm-yyyy")
+        return
+    fmt=input("format (text/csv)") or "text"
+    try:
+        for line in get_service().statement(*session, start, end, fmt.lower()):
+            print(line, end="")
+    except storage.AccountError as exc:
+        print(exc)
+
+def bulk_import():
+    # branch files: one account per CSV row / JSONL line, see onboard.py
+    if API_URL:
+        print("bulk import runs against the local data directory, not BANK_API_URL")
+        return
+    path=input("enter the file to import (.csv or .jsonl)")
+    try:
+        result=onboard.import_file(get_store(), path)
+    except (OSError, onboard.OnboardingError) as exc:
+        print("import failed:", exc)
+        return
+    print("accounts opened:", result.accepted)
+    print("rejected:", result.rejected, "see", result.rejects_path)
 
 def customer_service():
     print("use our service")
@@ -87,14 +200,15 @@ def customer_service():
     print("4)call our service")
     print("5 exit")
 
-    choice=0
+    choice=read_int("enter your choice")
     if choice==1:
-        correct_pin=685457
-        user=int(input("enter the pin")) 
-        if user==correct_pin:
-            print(create_account)
-        else:
-            print("invalid pin")
+        session=login()
+        if session is not None:
+            account=get_service().account_info(*session)
+            print("name:",account.name)
+            print("account type:",account.account_type)
+            print("phone:",account.phone)
+            print("email:",account.email)
     elif choice==2:
             check_balance()
     elif choice==3:
@@ -111,7 +225,10 @@ def main():
      print("welocme to bank systrem")
 
      while True:
-          customer_service()
+          try:
+               customer_service()
+          except OSError as exc:
+               unavailable(exc)
           print("what can we help you")
           print("1) create account")
           print("2)check balance")
@@ -119,25 +236,24 @@ def main():
           print("4) deposit balance")
           print("5) pin. change")
           print("6) exit")
+          print("7) bulk import")
+          print("8) account statement")
 
-          choice=0
-          if choice==1:
-               create_account()
-          elif choice==2:
-               check_balance()
-          elif choice==3:
-               withdraw_balance()
-          elif choice==4:
-               deposit_balance()
-          elif choice==5:
-               pin_change()
-          elif choice==6:
+          choice=read_int("enter your choice")
+          if choice==6:
                print("thank you for using our service")
                break
-          else:
+          action={1: create_account, 2: check_balance, 3: withdraw_balance,
+                  4: deposit_balance, 5: pin_change, 7: bulk_import,
+                  8: account_statement}.get(choice)
+          if action is None:
                print("invalid choice")
-
-        
+               continue
+          try:
+               action()
+          except OSError as exc:
+               unavailable(exc)
 
 
-    
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,40 @@
-import datetime
+from getpass import getpass
 
-accounts = []
+from app import get_service, read_amount
+import storage
+from service import NewAccount, age
 
 def create_account():
     name = input("Enter your name: ")
     dob = input("Enter DOB (dd-mm-yyyy): ")
 
-    dob_datetime = datetime.datetime.strptime(dob, "%d-%m-%Y")
-    today = datetime.date.today()
-
-    age = today.year - dob_datetime.year - (
-        (today.month, today.day) < (dob_datetime.month, dob_datetime.day)
-    )
+    try:
+        years = age(dob)
+    except storage.AccountError as exc:
+        print(exc)
+        return
 
-    if age < 18:
+    if years < 18:
         print("Not eligible")
         return
 
-    balance = float(input("Enter initial deposit: "))
-
-    account = {
-        "name": name,
-        "age": age,
-        "balance": balance,
-        "pin": 1234
-    }
-
-    accounts.append(account)
-    print("Account created")
+    balance = read_amount("Enter initial deposit: ")
+    if balance is None:
+        print("Invalid amount")
+        return
+    pin = getpass("Choose a PIN (4-6 digits): ")
+
+    try:
+        info = get_service().create_account(NewAccount(
+            name=name, dob=dob, address="", phone="", email="", account_type="savings",
+            deposit_cents=balance, pin=pin))
+    except storage.AccountError as exc:
+        print(exc)
+        return
+    print("Account created, number", info.account_id)
 
 def main():
     create_account()
 
-main()
+if __name__ == "__main__":
+    main()
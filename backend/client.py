@@ -0,0 +1,88 @@
+import datetime
+import json
+import urllib.error
+import urllib.request
+from collections.abc import Iterator
+
+import security
+from accounts import AccountError, DuplicateAccount, InsufficientFunds, UnknownAccount
+from ledger import format_cents
+from service import AccountInfo, Balance, NewAccount
+
+
+# ================== HTTP client ==================
+
+# Server error names back to the exceptions BankService would have raised,
+# so callers handle a remote bank exactly like a local one
+ERRORS = {cls.__name__: cls for cls in (AccountError, UnknownAccount, DuplicateAccount,
+                                        InsufficientFunds, security.AuthError)}
+
+
+class BankClient:
+    # Same methods and return types as service.BankService, over the JSON
+    # API in server.py. Network failures surface as OSError.
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _open(self, path, body):
+        request = urllib.request.Request(self.base_url + path, data=json.dumps(body).encode(),
+                                         headers={"Content-Type": "application/json"},
+                                         method="POST")
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as exc:
+            try:
+                error = json.loads(exc.read())
+            except ValueError:
+                raise AccountError(f"server error {exc.code}") from None
+            if error.get("error") == "LockedOut":
+                raise security.LockedOut(error["retry_after"]) from None
+            raise ERRORS.get(error.get("error"), AccountError)(error.get("message")) from None
+
+    def _call(self, path, body):
+        with self._open(path, body) as response:
+            data = response.read()
+        return json.loads(data) if data else None
+
+    def create_account(self, req: NewAccount) -> AccountInfo:
+        return AccountInfo(**self._call("/accounts", {
+            "name": req.name, "dob": req.dob, "address": req.address, "phone": req.phone,
+            "email": req.email, "account_type": req.account_type,
+            "deposit": format_cents(req.deposit_cents), "pin": req.pin}))
+
+    def account_info(self, account_id: int, pin: str) -> AccountInfo:
+        return AccountInfo(**self._call(f"/accounts/{account_id}/info", {"pin": pin}))
+
+    def check_balance(self, account_id: int, pin: str) -> Balance:
+        data = self._call(f"/accounts/{account_id}/balance", {"pin": pin})
+        return Balance(data["account_id"], data["cents"])
+
+    def deposit(self, account_id: int, cents: int) -> Balance:
+        data = self._call(f"/accounts/{account_id}/deposit", {"amount": format_cents(cents)})
+        return Balance(data["account_id"], data["cents"])
+
+    def withdraw(self, account_id: int, pin: str, cents: int) -> Balance:
+        data = self._call(f"/accounts/{account_id}/withdraw",
+                          {"pin": pin, "amount": format_cents(cents)})
+        return Balance(data["account_id"], data["cents"])
+
+    def transfer(self, account_id: int, pin: str, to: int, cents: int) -> Balance:
+        data = self._call(f"/accounts/{account_id}/transfer",
+                          {"pin": pin, "to": to, "amount": format_cents(cents)})
+        return Balance(data["account_id"], data["cents"])
+
+    def change_pin(self, account_id: int, pin: str, new_pin: str) -> None:
+        self._call(f"/accounts/{account_id}/pin", {"pin": pin, "new_pin": new_pin})
+
+    def statement(self, account_id: int, pin: str, start: datetime.date, end: datetime.date,
+                  fmt: str = "text") -> Iterator[str]:
+        # Errors are raised here; the lines then arrive as the server sends them
+        response = self._open(f"/accounts/{account_id}/statement", {
+            "pin": pin, "from": f"{start:%d-%m-%Y}", "to": f"{end:%d-%m-%Y}", "format": fmt})
+
+        def lines():
+            with response:
+                for line in response:
+                    yield line.decode("utf-8")
+        return lines()
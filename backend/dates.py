@@ -0,0 +1,109 @@
+import datetime
+import random
+import sys
+import time
+from functools import lru_cache
+
+
+# ================== Parsing ==================
+
+# Dates of birth are dd-mm-yyyy. The fixed layout is sliced directly; only
+# odd shapes that strptime would still accept ("1-1-1990") go to strptime,
+# so both accept exactly the same strings. There are only ~36k birthdays
+# in a century, so a bounded memo turns almost every parse into one lookup.
+FORMAT = "%d-%m-%Y"
+CACHE_SIZE = 1 << 16
+
+
+def _parse(text):
+    if (len(text) == 10 and text[2] == "-" and text[5] == "-" and text[:2].isdigit()
+            and text[3:5].isdigit() and text[6:].isdigit()):
+        return datetime.date(int(text[6:]), int(text[3:5]), int(text[:2]))
+    return datetime.datetime.strptime(text, FORMAT).date()
+
+
+# dd-mm-yyyy -> datetime.date; ValueError if it is not a real date
+parse_date = lru_cache(maxsize=CACHE_SIZE)(_parse)
+parse_dob = parse_date
+
+
+# ================== Today and ages ==================
+
+# (today, wall clock time of the next local midnight), replaced as a whole
+# so a thread never pairs one day's date with another day's rollover
+_today = (None, 0.0)
+
+
+def today():
+    # date.today(), recomputed once per day instead of once per call
+    global _today
+    day, until = _today
+    now = time.time()
+    if now >= until:
+        day = datetime.date.fromtimestamp(now)
+        _today = day, datetime.datetime.combine(day + datetime.timedelta(days=1),
+                                                datetime.time()).timestamp()
+    return day
+
+
+def age_on(dob, on):
+    return on.year - dob.year - ((on.month, on.day) < (dob.month, dob.day))
+
+
+# (day, {dob string: age on that day}). Threads share it without a lock: a
+# thread reads the pair once, so an age computed for one day only ever goes
+# into that day's dict, and a new day swaps in a fresh pair.
+_ages = (None, {})
+
+
+def age(text, on=None):
+    # Age in whole years of someone born on dd-mm-yyyy `text`, today unless
+    # `on` is given. Today's ages are memoized per string for the rest of
+    # the day. ValueError for an invalid date.
+    global _ages
+    if on is not None:
+        return age_on(parse_dob(text), on)
+    day = today()
+    ages_day, ages = _ages
+    if ages_day != day:
+        ages = {}
+        _ages = day, ages
+    years = ages.get(text)
+    if years is None:
+        if len(ages) >= CACHE_SIZE:
+            ages.clear()
+        years = ages[text] = age_on(parse_dob(text), day)
+    return years
+
+
+# ================== Benchmark ==================
+
+def bench(n=10_000_000, seed=1):
+    # n DOBs drawn from 1940-2005, so repeats are realistic (~24k distinct)
+    rng = random.Random(seed)
+    pool = [f"{d:02d}-{m:02d}-{y}" for y in range(1940, 2006) for m in range(1, 13)
+            for d in range(1, 29)]
+    dobs = [rng.choice(pool) for _ in range(n)]
+    on = datetime.date.today()
+
+    def run(label, fn):
+        start = time.perf_counter()
+        for text in dobs:
+            fn(text)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<34} {elapsed:7.2f}s  {elapsed / n * 1e9:7.0f} ns/DOB")
+        return elapsed
+
+    strptime = datetime.datetime.strptime
+    print(f"{n:,} DOBs")
+    base = run("strptime + date.today() (before)",
+               lambda text: age_on(strptime(text, FORMAT), datetime.date.today()))
+    run("sliced parse, no cache", lambda text: age_on(_parse(text), on))
+    parse_dob.cache_clear()
+    run("parse_dob (memoized)", parse_dob)
+    fast = run("age() (memoized, cached today)", age)
+    print(f"speedup {base / fast:.0f}x")
+
+
+if __name__ == "__main__":
+    bench(*(int(a) for a in sys.argv[1:2]))
@@ -0,0 +1,118 @@
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+from ledger import CASH
+
+
+# ================== Engine ==================
+
+class TransactionEngine:
+    # Runs deposits, withdrawals and transfers on a thread pool. Each call
+    # returns a Future that resolves to the new balance (in cents) once the
+    # change is durable, or raises the AccountError that rejected it.
+    # Isolation comes from the store's per-account striped locks; the pool
+    # just keeps enough operations in flight for group commit to batch them.
+    def __init__(self, store, workers=64):
+        self.store = store
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="txn")
+
+    def deposit(self, account_id, cents):
+        return self.pool.submit(self.store.deposit, account_id, cents)
+
+    def withdraw(self, account_id, cents):
+        return self.pool.submit(self.store.withdraw, account_id, cents)
+
+    def transfer(self, src, dst, cents):
+        return self.pool.submit(self.store.transfer, src, dst, cents)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ================== Stress test ==================
+
+def verify(store, expected_total):
+    # The books must balance, every materialized balance must equal the sum
+    # of its postings (a lost update would break this), nothing may be
+    # overdrawn, and customer money must match what was acknowledged.
+    ledger = store.ledger
+    problems = []
+    if ledger.trial_balance() != 0:
+        problems.append(f"trial balance {ledger.trial_balance()}")
+    for account, postings in ledger.postings.items():
+        total = sum(ledger.amount[i] for i in postings)
+        if total != ledger.balances[account]:
+            problems.append(f"{account}: balance {ledger.balances[account]} != postings {total}")
+        if account != CASH and total < 0:
+            problems.append(f"{account}: overdrawn ({total})")
+    customers = -ledger.balance(CASH)
+    if customers != expected_total:
+        problems.append(f"customer money {customers} != acknowledged {expected_total}")
+    return problems
+
+
+def stress(accounts=1000, workers=64, ops=100_000, opening=100_000):
+    directory = tempfile.mkdtemp()
+    store = storage.AccountStore(directory)
+    ids = [store.create_account("stress", "01-01-1990", "-", "", "", "savings", opening)
+           for _ in range(accounts)]
+    rng = random.Random(1)
+    totals = {"deposit": 0, "withdraw": 0}
+    counts = {"ok": 0, "rejected": 0}
+    tally = threading.Lock()
+
+    def track(kind, cents):
+        def done(future):
+            with tally:
+                if future.exception() is None:
+                    counts["ok"] += 1
+                    if kind in totals:
+                        totals[kind] += cents
+                else:
+                    counts["rejected"] += 1
+        return done
+
+    start = time.perf_counter()
+    with TransactionEngine(store, workers) as engine:
+        for _ in range(ops):
+            roll = rng.random()
+            cents = rng.randrange(1, 20_000)
+            a, b = rng.sample(ids, 2)
+            if roll < 0.6:
+                kind, future = "transfer", engine.transfer(a, b, cents)
+            elif roll < 0.8:
+                kind, future = "deposit", engine.deposit(a, cents)
+            else:
+                kind, future = "withdraw", engine.withdraw(a, cents)
+            future.add_done_callback(track(kind, cents))
+    elapsed = time.perf_counter() - start
+    flushes = store.wal.flushes
+
+    expected = accounts * opening + totals["deposit"] - totals["withdraw"]
+    problems = verify(store, expected)
+    store.close()
+    # Everything acknowledged must also come back after a restart
+    recovered = storage.AccountStore(directory)
+    problems += [f"after recovery: {p}" for p in verify(recovered, expected)]
+    recovered.close()
+
+    print(f"{ops:,} ops on {accounts} accounts with {workers} workers: "
+          f"{ops / elapsed:,.0f} ops/s, {counts['rejected']:,} rejected "
+          f"(insufficient funds), {ops / max(flushes, 1):.1f} ops/fsync")
+    print("ledger OK: sums to zero, no lost updates" if not problems else "\n".join(problems))
+    return not problems
+
+
+if __name__ == "__main__":
+    sys.exit(0 if stress(*(int(a) for a in sys.argv[1:4])) else 1)
@@ -0,0 +1,195 @@
+import argparse
+import datetime
+import random
+import sys
+import tempfile
+import time
+from contextlib import closing
+from dataclasses import dataclass
+
+import dates
+import runs
+import storage
+from ledger import CASH, format_cents, to_cents
+from service import MIN_OPENING
+
+
+# ================== Rules ==================
+
+# Savings earn SAVINGS_RATE_BP basis points a year, accrued daily on the
+# end-of-day balance. Current accounts below their minimum balance (the
+# opening minimum) pay LOW_BALANCE_FEE for the day, never more than they
+# hold.
+SAVINGS_RATE_BP = 350
+DAYS_PER_YEAR = 365
+CURRENT_MIN_BALANCE = MIN_OPENING["current"]
+LOW_BALANCE_FEE = to_cents(5)
+CHUNK = 10_000
+
+
+def daily_interest(cents, rate_bp=SAVINGS_RATE_BP):
+    # Rounded half up to the cent, in integers
+    denominator = 10_000 * DAYS_PER_YEAR
+    return (2 * cents * rate_bp + denominator) // (2 * denominator)
+
+
+def assess(chunk):
+    # chunk = (account ids, [(type, balance)]); returns
+    # ([(id, interest)], [(id, fee)]) with zero amounts left out.
+    ids, rows = chunk
+    interest, fees = [], []
+    for account_id, (account_type, balance) in zip(ids, rows):
+        if account_type == "savings":
+            cents = daily_interest(balance) if balance > 0 else 0
+            if cents:
+                interest.append((account_id, cents))
+        elif account_type == "current" and 0 < balance < CURRENT_MIN_BALANCE:
+            fees.append((account_id, min(LOW_BALANCE_FEE, balance)))
+    return interest, fees
+
+
+def _assess_at(store, chunk_ids, cutoff):
+    return assess((chunk_ids, store.balances_at(chunk_ids, cutoff)))
+
+
+def _assess_job(job):
+    # In a forked worker: the balance reads happen here too, not in the parent
+    return _assess_at(runs.worker_store(), *job)
+
+
+# ================== Run ==================
+
+@dataclass(slots=True)
+class RunReport(runs.RunReport):
+    run: str = ""
+    interest: int = 0       # cents credited
+    fees: int = 0           # cents charged
+    resumed_after: int = 0  # last account id done before this invocation
+    already_done: bool = False
+
+
+def day_end(day):
+    # Timestamp of local midnight after `day`
+    return datetime.datetime.combine(day + datetime.timedelta(days=1),
+                                     datetime.time()).timestamp()
+
+
+def run_eod(store, day=None, workers=None, chunk=CHUNK, stop_after=None):
+    # End-of-day run for `day` (default today), as of the end of that day or
+    # the run's start, whichever is earlier; a resumed run keeps the cutoff
+    # its first part recorded. Workers forked from the store
+    # (runs.forked_pool) read balances at that cutoff and assess them a
+    # chunk at a time; the parent only posts each chunk, in account order,
+    # with its progress mark (AccountStore.post_run). Run again after an
+    # interruption and it resumes after the last posted chunk. With one
+    # core or workers=0 it all runs in-process. stop_after=n stops after n
+    # chunks (for testing resumption).
+    day = day or dates.today()
+    run = f"eod-{day.isoformat()}"
+    through, done, cutoff = store.run_progress(run)
+    if cutoff is None:
+        cutoff = min(day_end(day), time.time())
+    report = RunReport(run=run, resumed_after=through)
+    if done:
+        report.already_done = True
+        return report
+    start = time.perf_counter()
+    with store.lock:
+        ids = sorted(a for a in store.accounts.by_id if a > through)
+    chunks = (ids[i:i + chunk] for i in range(0, len(ids), chunk))
+    pool_workers = runs.pool_size(workers)
+
+    def assessed():
+        # (ids, interest, fees) per chunk, in account order
+        if not pool_workers:
+            for chunk_ids in chunks:
+                yield (chunk_ids, *_assess_at(store, chunk_ids, cutoff))
+            return
+        # At most two chunks per worker in flight, so memory stays bounded
+        jobs = ((chunk_ids, cutoff) for chunk_ids in chunks)
+        with runs.forked_pool(store, pool_workers) as pool, closing(runs.ordered_results(
+                pool, _assess_job, jobs, 2 * pool_workers)) as results:
+            for (chunk_ids, _), (interest, fees) in results:
+                yield chunk_ids, interest, fees
+
+    total = (len(ids) + chunk - 1) // chunk
+    results = assessed()
+    for n, (chunk_ids, interest, fees) in enumerate(results, 1):
+        charged = store.post_run(run, chunk_ids[-1], interest, fees, done=n == total,
+                                 cutoff=cutoff)
+        report.accounts += len(chunk_ids)
+        report.interest += sum(cents for _, cents in interest)
+        report.fees += sum(cents for _, cents in charged)
+        if n == stop_after:
+            break
+    results.close()
+    if total == 0:
+        store.post_run(run, through, [], [], done=True, cutoff=cutoff)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def print_report(report):
+    if report.already_done:
+        print(f"{report.run} already finished")
+        return
+    resumed = f" (resumed after account {report.resumed_after})" if report.resumed_after else ""
+    print(f"{report.run}{resumed}: {report.accounts:,} accounts in {report.seconds:.2f}s "
+          f"= {report.rate:,.0f} accounts/s; interest {format_cents(report.interest)}, "
+          f"fees {format_cents(report.fees)}")
+
+
+# ================== Command line ==================
+
+def bench(accounts=1_000_000, workers=None, chunk=CHUNK):
+    # Builds a store, interrupts a run halfway, reopens the store and
+    # resumes, then checks every account got exactly one assessment
+    directory = tempfile.mkdtemp()
+    rng = random.Random(1)
+    with storage.AccountStore(directory) as store:
+        for start in range(0, accounts, CHUNK):
+            store.create_accounts([
+                ("bench", "01-01-1990", "-", "", "", "savings" if i % 2 else "current",
+                 rng.choice((rng.randint(100, 99_999), rng.randint(100_000, 10_000_000))), "")
+                for i in range(start, min(start + CHUNK, accounts))])
+        expected = assess((list(store.accounts.by_id),
+                           store.balances_at(list(store.accounts.by_id), time.time())))
+        money = -store.ledger.balance(CASH)
+        half = (accounts + chunk - 1) // chunk // 2
+        first = run_eod(store, workers=workers, chunk=chunk, stop_after=half or None)
+    print_report(first)
+    with storage.AccountStore(directory) as store:
+        second = run_eod(store, workers=workers, chunk=chunk)
+        print_report(second)
+        interest = sum(cents for _, cents in expected[0])
+        fees = sum(cents for _, cents in expected[1])
+        ok = (first.accounts + second.accounts == accounts
+              and first.interest + second.interest == interest
+              and first.fees + second.fees == fees
+              and -store.ledger.balance(CASH) == money + interest - fees
+              and store.ledger.trial_balance() == 0)
+    print(f"total {first.seconds + second.seconds:.2f}s for {accounts:,} accounts; " +
+          ("each account assessed exactly once" if ok else "MISMATCH after resume"))
+    return ok
+
+
+def main(argv=None):
+    import app
+
+    parser = argparse.ArgumentParser(description="End-of-day interest and fees")
+    parser.add_argument("--date", type=datetime.date.fromisoformat,
+                        help="business day, yyyy-mm-dd (default today)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk", type=int, default=CHUNK)
+    args = parser.parse_args(argv)
+    store = app.get_store()
+    try:
+        print_report(run_eod(store, args.date, args.workers, args.chunk))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["bench"]:
+        sys.exit(0 if bench(*(int(a) for a in sys.argv[2:5])) else 1)
+    main()
@@ -0,0 +1,257 @@
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import repeat
+from decimal import ROUND_HALF_EVEN, Decimal
+
+
+# ================== Money ==================
+
+# All amounts are integer cents (paise); floats never touch a balance.
+
+def to_cents(amount):
+    # Accepts what a user types ("12.5") as well as ints/floats
+    cents = (Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_EVEN)
+    return int(cents)
+
+
+def format_cents(cents):
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+# ================== Ledger ==================
+
+# Double entry: every transaction is a set of postings that sum to zero.
+# Money entering or leaving the bank is posted against CASH, so the sum of
+# all balances, CASH included, is always zero.
+CASH = 0
+
+DEPOSIT, WITHDRAWAL, TRANSFER, OPENING, INTEREST, FEE = range(6)
+KIND_NAMES = ("deposit", "withdrawal", "transfer", "opening", "interest", "fee")
+
+# Per-account balance checkpoint every CHECKPOINT_EVERY postings: a point in
+# time balance is the nearest checkpoint plus at most that many postings.
+CHECKPOINT_EVERY = 64
+
+# On disk, entries are fixed-size records in posting order, so entry n is
+# at offset n * _ENTRY.size:
+#   txn:u64 account:u64 ts:f64 amount:i64 kind:u8 (padding)
+_ENTRY = struct.Struct("<QQdqB7x")
+
+
+class LedgerError(ValueError):
+    pass
+
+
+class Ledger:
+    # Entries are immutable and kept as parallel typed arrays indexed by
+    # entry number. Balances are materialized and updated per posting;
+    # self.postings[account] lists that account's entry numbers in order.
+    def __init__(self):
+        self.txn = array("Q")
+        self.account = array("Q")
+        self.ts = array("d")
+        self.amount = array("q")
+        self.kind = array("B")
+        self.balances = {}
+        self.postings = {}
+        self.checkpoints = {}  # account -> balance before posting j*CHECKPOINT_EVERY
+        self.next_txn = 1
+        self.saved = 0         # entries already written to the ledger file
+
+    def __len__(self):
+        return len(self.txn)
+
+    def _append(self, txn, account, ts, amount, kind):
+        n = len(self.txn)
+        self.txn.append(txn)
+        self.account.append(account)
+        self.ts.append(ts)
+        self.amount.append(amount)
+        self.kind.append(kind)
+        postings = self.postings.get(account)
+        if postings is None:
+            postings = self.postings[account] = array("Q")
+            self.checkpoints[account] = array("q")
+        balance = self.balances.get(account, 0)
+        if len(postings) % CHECKPOINT_EVERY == 0:
+            self.checkpoints[account].append(balance)
+        postings.append(n)
+        self.balances[account] = balance + amount
+
+    def _extend(self, txn, postings, ts, kind):
+        # _append for many postings at once (bulk openings, batch runs):
+        # the column arrays grow in one call each, the rest is inlined
+        n, k = len(self.txn), len(postings)
+        self.txn.extend(repeat(txn, k))
+        self.account.extend([account for account, _ in postings])
+        self.ts.extend(repeat(ts, k))
+        self.amount.extend([amount for _, amount in postings])
+        self.kind.extend(repeat(kind, k))
+        balances, index, checkpoints = self.balances, self.postings, self.checkpoints
+        for i, (account, amount) in enumerate(postings, n):
+            entries = index.get(account)
+            if entries is None:
+                index[account] = array("Q", (i,))
+                checkpoints[account] = array("q", (0,))
+                balances[account] = amount
+                continue
+            balance = balances[account]
+            if len(entries) % CHECKPOINT_EVERY == 0:
+                checkpoints[account].append(balance)
+            entries.append(i)
+            balances[account] = balance + amount
+
+    def post(self, kind, postings, ts=None):
+        # postings: [(account, cents), ...] summing to zero
+        if sum(amount for _, amount in postings) != 0:
+            raise LedgerError("postings do not balance")
+        if ts is None:
+            ts = time.time()
+        txn = self.next_txn
+        self.next_txn += 1
+        if len(postings) > 16:
+            self._extend(txn, postings, ts, kind)
+        else:
+            for account, amount in postings:
+                self._append(txn, account, ts, amount, kind)
+        return txn
+
+    def deposit(self, account, cents, ts=None, kind=DEPOSIT):
+        return self.post(kind, [(account, cents), (CASH, -cents)], ts)
+
+    def withdraw(self, account, cents, ts=None, kind=WITHDRAWAL):
+        return self.post(kind, [(account, -cents), (CASH, cents)], ts)
+
+    def transfer(self, src, dst, cents, ts=None):
+        return self.post(TRANSFER, [(src, -cents), (dst, cents)], ts)
+
+    # ---------- queries ----------
+    def balance(self, account):
+        return self.balances.get(account, 0)
+
+    def count_until(self, account, ts):
+        # Number of the account's postings with a timestamp <= ts
+        postings = self.postings.get(account, ())
+        return bisect_right(postings, ts, key=self.ts.__getitem__)
+
+    def count_before(self, account, ts):
+        # Number of the account's postings with a timestamp < ts
+        postings = self.postings.get(account, ())
+        return bisect_left(postings, ts, key=self.ts.__getitem__)
+
+    def balance_after(self, account, n):
+        # Balance after the account's first n postings: the nearest
+        # checkpoint plus fewer than CHECKPOINT_EVERY postings
+        postings = self.postings.get(account)
+        if not postings:
+            return 0
+        if n >= len(postings):
+            return self.balances[account]
+        j = n // CHECKPOINT_EVERY
+        balance = self.checkpoints[account][j]
+        amount = self.amount
+        for i in range(j * CHECKPOINT_EVERY, n):
+            balance += amount[postings[i]]
+        return balance
+
+    def balance_at(self, account, ts):
+        # Balance after every posting up to and including time ts
+        return self.balance_after(account, self.count_until(account, ts))
+
+    def cursor(self, account, start, end, stop=None):
+        # The account's entry numbers with start <= ts < end, in posting
+        # order: a binary search to the first, then a walk, so a range
+        # costs O(log n + entries in it) however long the history is. Only
+        # the account's first `stop` postings are walked, if given.
+        postings = self.postings.get(account)
+        if not postings:
+            return
+        ts = self.ts
+        stop = len(postings) if stop is None else min(stop, len(postings))
+        for i in range(self.count_before(account, start), stop):
+            n = postings[i]
+            if ts[n] >= end:
+                return
+            yield n
+
+    def counterparty(self, n):
+        # For an entry of a transfer: the account on the other side.
+        # transfer() posts the debit then the credit, next to each other,
+        # so a reader racing a transfer must not go past a debit whose
+        # credit may not be there yet (see AccountStore.history).
+        return self.account[n + 1 if self.amount[n] < 0 else n - 1]
+
+    def trial_balance(self):
+        # Zero unless the books are broken
+        return sum(self.balances.values())
+
+    # ---------- persistence ----------
+    def write(self, path):
+        # Append entries not yet on disk; returns the total entry count,
+        # which the caller records in its snapshot
+        end = len(self.txn)
+        if self.saved < end:
+            with open(path, "ab") as f:
+                if f.tell() != self.saved * _ENTRY.size:
+                    f.truncate(self.saved * _ENTRY.size)
+                f.write(b"".join(_ENTRY.pack(self.txn[i], self.account[i], self.ts[i],
+                                             self.amount[i], self.kind[i])
+                                 for i in range(self.saved, end)))
+                f.flush()
+                os.fsync(f.fileno())
+            self.saved = end
+        return end
+
+    @classmethod
+    def load(cls, path, count):
+        # Only the first count entries are trusted (the rest were written
+        # after the last snapshot and will be replayed from the log)
+        ledger = cls()
+        if count:
+            with open(path, "rb") as f:
+                data = f.read(count * _ENTRY.size)
+            if len(data) < count * _ENTRY.size:
+                raise LedgerError(f"{path}: expected {count} entries")
+            for txn, account, ts, amount, kind in _ENTRY.iter_unpack(data):
+                ledger._append(txn, account, ts, amount, kind)
+            ledger.next_txn = ledger.txn[-1] + 1
+        ledger.saved = count
+        return ledger
+
+
+# ================== Benchmark ==================
+
+def bench(entries=1_000_000, accounts=100, queries=20_000):
+    import random
+
+    rng = random.Random(1)
+    ledger = Ledger()
+    start = time.perf_counter()
+    for i in range(entries // 2):
+        ledger.deposit(rng.randrange(1, accounts + 1), rng.randrange(1, 100_000), ts=float(i))
+    post_t = time.perf_counter() - start
+    print(f"{len(ledger):,} entries: {len(ledger) / post_t:,.0f} postings/s, "
+          f"trial balance {ledger.trial_balance()}")
+
+    picks = [(rng.randrange(1, accounts + 1), rng.uniform(0, entries // 2)) for _ in range(queries)]
+    start = time.perf_counter()
+    fast = [ledger.balance_at(a, t) for a, t in picks]
+    fast_t = (time.perf_counter() - start) / queries
+
+    # Reference: replay the account's whole history
+    def replay(account, t):
+        return sum(ledger.amount[i] for i in ledger.postings.get(account, ()) if ledger.ts[i] <= t)
+    start = time.perf_counter()
+    slow = [replay(a, t) for a, t in picks[:queries // 10]]
+    slow_t = (time.perf_counter() - start) / (queries // 10)
+    assert fast[:len(slow)] == slow
+    print(f"balance_at: {fast_t * 1e6:.1f} us (checkpoints)  vs  {slow_t * 1e6:.1f} us (replay)")
+
+
+if __name__ == "__main__":
+    bench(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,90 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+
+# ================== Reports ==================
+
+@dataclass(slots=True)
+class RunReport:
+    # What a batch run over accounts did; runs subclass it for their totals
+    accounts: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self):
+        return self.accounts / self.seconds if self.seconds else 0.0
+
+
+# ================== Forked workers ==================
+
+# Batch runs (statements, end of day) hand chunks of accounts to worker
+# processes that read the parent's in-memory store directly: forked, the
+# ledger is shared copy-on-write instead of pickled. The store is published
+# here for the workers just before they are forked.
+_store = None
+
+
+def pool_size(workers):
+    # Worker processes for `workers` (None: one per core). 0 means run
+    # in-process: one worker only adds a fork and pickling, and without
+    # fork() workers could not share the store.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return workers if workers > 1 and "fork" in multiprocessing.get_all_start_methods() else 0
+
+
+def worker_store():
+    # The store, inside a worker of forked_pool
+    return _store
+
+
+def _init_worker():
+    # The forking thread held the store lock; this process has no other
+    # thread to release it, and only ever reads
+    _store.lock = threading.RLock()
+
+
+@contextmanager
+def forked_pool(store, workers):
+    # A process pool whose workers all see `store` as of one instant. A
+    # fork pool starts every worker on its first submit, so that submit is
+    # made holding store.lock: every update is applied under that lock, so
+    # no worker inherits a ledger or index half way through one, whatever
+    # the WAL flusher or request threads are doing. Workers must only read
+    # the store (under store.lock at most), never take its other locks, and
+    # don't see changes made after the fork.
+    global _store
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               mp_context=multiprocessing.get_context("fork"))
+    try:
+        with store.lock:
+            _store = store
+            pool.submit(int)
+        yield pool
+    finally:
+        _store = None
+        pool.shutdown(cancel_futures=True)
+
+
+def ordered_results(pool, fn, jobs, window):
+    # Runs fn(job) on the pool for each job and yields (job, result) in job
+    # order, with at most `window` jobs in flight so memory stays bounded
+    # however many there are. Closing early cancels jobs not yet started.
+    pending = deque()
+    try:
+        for job in jobs:
+            pending.append((job, pool.submit(fn, job)))
+            while len(pending) > window or (pending and pending[0][1].done()):
+                job, future = pending.popleft()
+                yield job, future.result()
+        while pending:
+            job, future = pending.popleft()
+            yield job, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
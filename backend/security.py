@@ -0,0 +1,215 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from accounts import AccountError
+
+
+# ================== PIN hashing ==================
+
+# Stored as "scrypt$n$r$p$salt$hash" (hex), so the cost can be raised later
+# without invalidating existing hashes. Stored parameters are bounded, so a
+# bad hash (from an import, say) can't ask for an unbounded KDF run.
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+MAX_N, MAX_R, MAX_P = 2 ** 17, 16, 4
+MAX_MEMORY = 2 ** 26  # bytes; scrypt needs about 128 * n * r
+PIN_LENGTHS = (4, 6)
+
+
+class AuthError(AccountError):
+    pass
+
+
+class LockedOut(AuthError):
+    def __init__(self, retry_after):
+        super().__init__(f"too many wrong PINs, try again in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def check_pin_format(pin):
+    lo, hi = PIN_LENGTHS
+    if not (pin.isdigit() and lo <= len(pin) <= hi):
+        raise AuthError(f"PIN must be {lo}-{hi} digits")
+
+
+def hash_pin(pin, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(pin.encode(), salt=salt, n=n, r=r, p=p, dklen=32)
+    return f"scrypt${n}${r}${p}${salt.hex()}${digest.hex()}"
+
+
+def parse_pin_hash(stored):
+    # (n, r, p, salt, digest) of a stored hash; ValueError if it is malformed
+    # or its parameters are out of bounds
+    scheme, n, r, p, salt, digest = stored.split("$")
+    if scheme != "scrypt" or not (n.isdigit() and r.isdigit() and p.isdigit()):
+        raise ValueError("not a scrypt PIN hash")
+    n, r, p, salt, digest = int(n), int(r), int(p), bytes.fromhex(salt), bytes.fromhex(digest)
+    if not (1 < n <= MAX_N and n & (n - 1) == 0 and 1 <= r <= MAX_R and 1 <= p <= MAX_P
+            and 128 * n * r < MAX_MEMORY):
+        raise ValueError("scrypt parameters out of bounds")
+    if not (8 <= len(salt) <= 64 and 16 <= len(digest) <= 64):
+        raise ValueError("bad scrypt salt or hash length")
+    return n, r, p, salt, digest
+
+
+def verify_pin_hash(pin, stored):
+    # False for a wrong PIN and for a malformed stored hash alike
+    try:
+        n, r, p, salt, digest = parse_pin_hash(stored)
+    except ValueError:
+        return False
+    candidate = hashlib.scrypt(pin.encode(), salt=salt, n=n, r=r, p=p, maxmem=MAX_MEMORY,
+                               dklen=len(digest))
+    return hmac.compare_digest(candidate, digest)
+
+
+# ================== Rate limiting ==================
+
+class TokenBucket:
+    # One bucket per key: `capacity` attempts are allowed at once, refilled
+    # at one per `refill_seconds`. A key whose bucket is empty is locked out
+    # until a token comes back. Only keys short of capacity are kept: refunds
+    # that fill a bucket drop it, and buckets that have refilled on their
+    # own are swept out as new ones are added.
+    def __init__(self, capacity=3, refill_seconds=300.0, sweep_at=10_000):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.sweep_at = sweep_at
+        self.buckets = {}  # key -> (tokens, time of last update)
+        self.lock = threading.Lock()
+
+    def _tokens(self, key, now):
+        tokens, last = self.buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - last) / self.refill_seconds)
+
+    def _sweep(self, now):
+        self.buckets = {key: v for key, v in self.buckets.items()
+                        if self._tokens(key, now) < self.capacity}
+        # Stay amortised when most buckets are genuinely short
+        self.sweep_at = max(self.sweep_at, 2 * len(self.buckets))
+
+    def try_acquire(self, key):
+        # Takes a token for one attempt and returns 0, or returns the
+        # seconds until one is available. Check and take happen under one
+        # lock, so concurrent attempts can't all pass an almost empty bucket.
+        with self.lock:
+            now = time.monotonic()
+            tokens = self._tokens(key, now)
+            if tokens < 1:
+                return (1 - tokens) * self.refill_seconds
+            if key not in self.buckets and len(self.buckets) >= self.sweep_at:
+                self._sweep(now)
+            self.buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def refund(self, key):
+        # Gives back a token taken by try_acquire for an attempt that
+        # turned out not to count (a correct PIN)
+        with self.lock:
+            now = time.monotonic()
+            tokens = self._tokens(key, now) + 1
+            if tokens >= self.capacity:
+                self.buckets.pop(key, None)
+            else:
+                self.buckets[key] = (tokens, now)
+
+    def reset(self, key):
+        with self.lock:
+            self.buckets.pop(key, None)
+
+
+# ================== Verification ==================
+
+class PinGuard:
+    # Checks PINs against the store's hashes. A successful check is
+    # remembered for `ttl` seconds as an HMAC of the PIN under a per-process
+    # key, so the next operation in the same session costs one HMAC instead
+    # of a scrypt run. Entries die with a PIN change or after ttl; the PIN
+    # itself is never kept.
+    def __init__(self, store, ttl=300.0, attempts=3, refill_seconds=300.0):
+        self.store = store
+        self.ttl = ttl
+        self.limiter = TokenBucket(attempts, refill_seconds)
+        self.key = secrets.token_bytes(32)
+        self.verified = {}  # account id -> (pin mac, expiry, pin hash it was checked against)
+        self.lock = threading.Lock()
+
+    def _mac(self, pin):
+        return hmac.new(self.key, pin.encode(), hashlib.sha256).digest()
+
+    def verify(self, account_id, pin):
+        # Every attempt holds a rate-limit token while it is checked, so
+        # parallel guesses are limited like sequential ones; a wrong PIN
+        # keeps the token, anything else gives it back
+        retry = self.limiter.try_acquire(account_id)
+        if retry:
+            raise LockedOut(retry)
+        try:
+            ok = self._check(account_id, pin)
+        except BaseException:
+            self.limiter.refund(account_id)
+            raise
+        if not ok:
+            raise AuthError("wrong PIN")
+        self.limiter.refund(account_id)
+
+    def _check(self, account_id, pin):
+        stored = self.store.pin_hash(account_id)
+        if not stored:
+            raise AuthError("no PIN set for this account")
+        mac = self._mac(pin)
+        now = time.monotonic()
+        with self.lock:
+            cached = self.verified.get(account_id)
+        if (cached is not None and cached[1] > now and cached[2] == stored
+                and hmac.compare_digest(cached[0], mac)):
+            return True
+        if not verify_pin_hash(pin, stored):
+            with self.lock:
+                self.verified.pop(account_id, None)
+            return False
+        with self.lock:
+            self.verified[account_id] = (mac, now + self.ttl, stored)
+            if len(self.verified) > 10_000:
+                self.verified = {k: v for k, v in self.verified.items() if v[1] > now}
+        return True
+
+    def change_pin(self, account_id, old_pin, new_pin):
+        self.verify(account_id, old_pin)
+        check_pin_format(new_pin)
+        self.store.set_pin(account_id, hash_pin(new_pin))
+        self.forget(account_id)
+
+    def forget(self, account_id):
+        # End the account's verified session
+        with self.lock:
+            self.verified.pop(account_id, None)
+
+
+# ================== Benchmark ==================
+
+def bench(rounds=20):
+    class Store:
+        hashes = {1: hash_pin("4321")}
+
+        def pin_hash(self, account_id):
+            return self.hashes.get(account_id, "")
+
+    guard = PinGuard(Store())
+    start = time.perf_counter()
+    for _ in range(rounds):
+        verify_pin_hash("4321", Store.hashes[1])
+    kdf = (time.perf_counter() - start) / rounds
+    guard.verify(1, "4321")
+    start = time.perf_counter()
+    for _ in range(rounds * 1000):
+        guard.verify(1, "4321")
+    cached = (time.perf_counter() - start) / (rounds * 1000)
+    print(f"scrypt verify {kdf * 1000:.1f} ms, cached session verify {cached * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,412 @@
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from decimal import InvalidOperation
+from http import HTTPStatus
+from itertools import islice
+
+import dates
+import security
+import storage
+from accounts import AccountError, DuplicateAccount, InsufficientFunds, UnknownAccount
+from ledger import to_cents
+from service import BankService, NewAccount
+
+
+# ================== Protocol ==================
+
+# JSON over HTTP/1.1, every call a POST (PINs never go in a URL):
+#   POST /accounts                      name dob address phone email account_type deposit pin
+#   POST /accounts/<id>/info            pin
+#   POST /accounts/<id>/balance         pin
+#   POST /accounts/<id>/deposit         amount
+#   POST /accounts/<id>/withdraw        pin amount
+#   POST /accounts/<id>/transfer        pin to amount
+#   POST /accounts/<id>/pin             pin new_pin
+#   POST /accounts/<id>/statement       pin from to [format]
+# Amounts are decimal strings ("12.50"); responses carry both "cents" and
+# "amount". Dates are dd-mm-yyyy. Statements stream back as text/csv or
+# text/plain (chunked). Errors are {"error": <exception name>, "message": ...}.
+
+log = logging.getLogger("bank.server")
+
+MAX_HEADER = 16 * 1024
+MAX_BODY = 64 * 1024
+IDLE_TIMEOUT = 30.0
+STREAM_LINES = 1000  # statement lines per chunk written
+
+# First match wins, so subclasses come before AccountError
+ERROR_STATUS = (
+    (security.LockedOut, HTTPStatus.TOO_MANY_REQUESTS),
+    (security.AuthError, HTTPStatus.UNAUTHORIZED),
+    (UnknownAccount, HTTPStatus.NOT_FOUND),
+    (DuplicateAccount, HTTPStatus.CONFLICT),
+    (InsufficientFunds, HTTPStatus.CONFLICT),
+    (AccountError, HTTPStatus.BAD_REQUEST),
+)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def error_body(exc):
+    body = {"error": type(exc).__name__, "message": str(exc)}
+    if isinstance(exc, security.LockedOut):
+        body["retry_after"] = exc.retry_after
+    return body
+
+
+@dataclass(slots=True)
+class Stream:
+    # A response body produced as it is sent
+    content_type: str
+    lines: Iterator[str]
+
+
+def balance_body(balance):
+    return {"account_id": balance.account_id, "cents": balance.cents, "amount": balance.amount}
+
+
+def field(body, name, kind=str):
+    value = body.get(name)
+    if not isinstance(value, kind):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name!r} must be a {kind.__name__}")
+    return value
+
+
+def amount_field(body, name="amount"):
+    value = body.get(name)
+    if not isinstance(value, (str, int)) or isinstance(value, bool):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name!r} must be a decimal string")
+    try:
+        return to_cents(value)
+    except (InvalidOperation, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name!r} is not a number") from None
+
+
+def date_field(body, name):
+    try:
+        return dates.parse_date(field(body, name))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name!r} must be dd-mm-yyyy") from None
+
+
+async def read_request(reader):
+    # Returns (method, path, headers, body), or None if the client closed
+    # the connection between requests
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as exc:
+        if not exc.partial:
+            return None
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "truncated request")
+    except asyncio.LimitOverrunError:
+        raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, version = lines[0].split(" ")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "bad request line") from None
+    headers = {"": version}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "bad content-length") from None
+    if length < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "bad content-length")
+    if length > MAX_BODY:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "body too large")
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except asyncio.IncompleteReadError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "truncated body") from None
+    return method, path, headers, body
+
+
+def keep_alive(headers):
+    connection = headers.get("connection", "").lower()
+    if headers[""] == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def take(lines, n=STREAM_LINES):
+    return "".join(islice(lines, n)).encode()
+
+
+def encode_response(status, payload, close):
+    body = b"" if payload is None else json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            + ("Connection: close\r\n" if close else "") + "\r\n")
+    return head.encode() + body
+
+
+# ================== Server ==================
+
+class BankServer:
+    # One coroutine per connection parses requests and writes responses;
+    # the service calls themselves block (fsync waits, scrypt), so they run
+    # on a thread pool and the event loop only ever waits on sockets. Idle
+    # connections cost a coroutine and a socket, so thousands are fine.
+    def __init__(self, service, workers=32):
+        self.service = service
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bank")
+        self.routes = {
+            "info": self._info,
+            "balance": self._balance,
+            "deposit": self._deposit,
+            "withdraw": self._withdraw,
+            "transfer": self._transfer,
+            "pin": self._pin,
+            "statement": self._statement,
+        }
+
+    # ---------- routes ----------
+    # Each returns a zero-argument callable for the pool and turns its
+    # result into (status, payload)
+    def _create(self, body):
+        req = NewAccount(name=field(body, "name"), dob=field(body, "dob"),
+                         address=field(body, "address"), phone=field(body, "phone"),
+                         email=field(body, "email"), account_type=field(body, "account_type"),
+                         deposit_cents=amount_field(body, "deposit"), pin=field(body, "pin"))
+        return (lambda: self.service.create_account(req),
+                lambda info: (HTTPStatus.CREATED, asdict(info)))
+
+    def _info(self, account_id, body):
+        pin = field(body, "pin")
+        return (lambda: self.service.account_info(account_id, pin),
+                lambda info: (HTTPStatus.OK, asdict(info)))
+
+    def _balance(self, account_id, body):
+        pin = field(body, "pin")
+        return (lambda: self.service.check_balance(account_id, pin),
+                lambda b: (HTTPStatus.OK, balance_body(b)))
+
+    def _deposit(self, account_id, body):
+        cents = amount_field(body)
+        return (lambda: self.service.deposit(account_id, cents),
+                lambda b: (HTTPStatus.OK, balance_body(b)))
+
+    def _withdraw(self, account_id, body):
+        pin, cents = field(body, "pin"), amount_field(body)
+        return (lambda: self.service.withdraw(account_id, pin, cents),
+                lambda b: (HTTPStatus.OK, balance_body(b)))
+
+    def _transfer(self, account_id, body):
+        pin, to, cents = field(body, "pin"), field(body, "to", int), amount_field(body)
+        return (lambda: self.service.transfer(account_id, pin, to, cents),
+                lambda b: (HTTPStatus.OK, balance_body(b)))
+
+    def _pin(self, account_id, body):
+        pin, new_pin = field(body, "pin"), field(body, "new_pin")
+        return (lambda: self.service.change_pin(account_id, pin, new_pin),
+                lambda _: (HTTPStatus.NO_CONTENT, None))
+
+    def _statement(self, account_id, body):
+        pin, start, end = field(body, "pin"), date_field(body, "from"), date_field(body, "to")
+        fmt = body.get("format", "text")
+        content_type = "text/csv" if fmt == "csv" else "text/plain"
+        return (lambda: self.service.statement(account_id, pin, start, end, fmt),
+                lambda lines: (HTTPStatus.OK, Stream(content_type, lines)))
+
+    def route(self, method, path, body):
+        parts = path.strip("/").split("/")
+        if parts[0] != "accounts" or len(parts) not in (1, 3):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no route {path}")
+        if method != "POST":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "use POST")
+        try:
+            body = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body is not JSON") from None
+        if not isinstance(body, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "body must be a JSON object")
+        if len(parts) == 1:
+            return self._create(body)
+        handler = self.routes.get(parts[2])
+        if handler is None or not (parts[1].isascii() and parts[1].isdigit()):
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no route {path}")
+        return handler(int(parts[1]), body)
+
+    async def dispatch(self, method, path, body):
+        try:
+            call, render = self.route(method, path, body)
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, call)
+        except HTTPError as exc:
+            return exc.status, {"error": "HTTPError", "message": str(exc)}
+        except AccountError as exc:
+            status = next(s for kind, s in ERROR_STATUS if isinstance(exc, kind))
+            return status, error_body(exc)
+        except Exception:
+            # A bug or a storage failure: the client still gets an answer,
+            # the details only go to the log
+            log.exception("%s %s failed", method, path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "InternalError",
+                                                      "message": "internal server error"}
+        return render(result)
+
+    # ---------- connections ----------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except HTTPError as exc:
+                    writer.write(encode_response(exc.status, {"error": "HTTPError",
+                                                              "message": str(exc)}, True))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self.dispatch(method, path, body)
+                close = not keep_alive(headers)
+                if isinstance(payload, Stream):
+                    close = await self.stream(writer, payload, headers[""] == "HTTP/1.0", close)
+                else:
+                    writer.write(encode_response(status, payload, close))
+                    await writer.drain()
+                if close:
+                    break
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream(self, writer, payload, http10, close):
+        # Chunked transfer, STREAM_LINES at a time, produced on the pool so
+        # a long statement never stalls the loop. HTTP/1.0 gets the raw body
+        # and a closed connection. Returns whether to close: if the client
+        # asked to, or if the body has no other end marker.
+        loop = asyncio.get_running_loop()
+        close = close or http10
+        head = f"HTTP/1.1 200 OK\r\nContent-Type: {payload.content_type}; charset=utf-8\r\n"
+        writer.write((head + ("Connection: close\r\n" if close else "")
+                      + ("\r\n" if http10 else "Transfer-Encoding: chunked\r\n\r\n")).encode())
+        while True:
+            try:
+                data = await loop.run_in_executor(self.pool, take, payload.lines)
+            except Exception:
+                # Too late for an error status: drop the connection without
+                # the final chunk, so the client sees a truncated body
+                log.exception("statement stream failed")
+                return True
+            if not data:
+                break
+            writer.write(data if http10 else b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+        if not http10:
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        return close
+
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER,
+                                          backlog=4096)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+async def serve(server, host, port):
+    listener = await server.start(host, port)
+    print(f"bank API on http://{host}:{listener.sockets[0].getsockname()[1]}")
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    import app
+
+    parser = argparse.ArgumentParser(description="Bank JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args(argv)
+    store = app.get_store()
+    server = BankServer(BankService(store, app.get_guard()), args.workers)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        store.close()
+
+
+# ================== Load test ==================
+
+def loadtest(connections=1000, requests=20, accounts=100):
+    # `connections` clients at once, each sending `requests` keep-alive
+    # requests (mostly deposits, some PIN-checked balance reads), against a
+    # fresh store. Checks that every acknowledged deposit landed.
+    directory = tempfile.mkdtemp()
+    store = storage.AccountStore(directory)
+    pin_hash = security.hash_pin("4321")
+    ids = [store.create_account("load", "01-01-1990", "-", "", "", "savings", 0, pin_hash)
+           for _ in range(accounts)]
+    server = BankServer(BankService(store), workers=64)
+    deposited = [0]
+
+    async def client(port, n):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        account_id = ids[n % accounts]
+        for i in range(requests):
+            if i % 5 == 4:
+                action, body = "balance", {"pin": "4321"}
+            else:
+                action, body = "deposit", {"amount": "1.00"}
+            data = json.dumps(body).encode()
+            writer.write(f"POST /accounts/{account_id}/{action} HTTP/1.1\r\n"
+                         f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = int(head.split(b" ", 2)[1])
+            length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+            await reader.readexactly(length)
+            if status != 200:
+                raise RuntimeError(f"{action} returned {status}")
+            if action == "deposit":
+                deposited[0] += 100
+        writer.close()
+
+    async def run():
+        listener = await server.start(port=0)
+        port = listener.sockets[0].getsockname()[1]
+        start = time.perf_counter()
+        await asyncio.gather(*(client(port, n) for n in range(connections)))
+        elapsed = time.perf_counter() - start
+        listener.close()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    server.close()
+    total = sum(store.balance(a) for a in ids)
+    store.close()
+    n = connections * requests
+    print(f"{n:,} requests over {connections:,} concurrent connections: "
+          f"{n / elapsed:,.0f} req/s")
+    ok = total == deposited[0]
+    print("deposits OK" if ok else f"balances {total} != acknowledged {deposited[0]}")
+    return ok
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["loadtest"]:
+        sys.exit(0 if loadtest(*(int(a) for a in sys.argv[2:5])) else 1)
+    main()
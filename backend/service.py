@@ -0,0 +1,169 @@
+import datetime
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import dates
+import security
+import statements
+from accounts import AccountError, valid_account_number
+from ledger import format_cents, to_cents
+
+
+# ================== Types ==================
+
+@dataclass(frozen=True, slots=True)
+class NewAccount:
+    name: str
+    dob: str            # dd-mm-yyyy
+    address: str
+    phone: str
+    email: str
+    account_type: str   # "savings" or "current"
+    deposit_cents: int
+    pin: str
+
+
+@dataclass(frozen=True, slots=True)
+class AccountInfo:
+    account_id: int
+    name: str
+    dob: str
+    address: str
+    phone: str
+    email: str
+    account_type: str
+
+
+@dataclass(frozen=True, slots=True)
+class Balance:
+    account_id: int
+    cents: int
+
+    @property
+    def amount(self):
+        return format_cents(self.cents)
+
+
+# ================== Rules ==================
+
+MIN_AGE = 18
+MIN_OPENING = {"savings": to_cents(500), "current": to_cents(1000)}
+MAX_AMOUNT = to_cents(10 ** 12)  # per operation; keeps every balance well inside int64
+
+
+def age(dob, today=None):
+    # Whole years since a dd-mm-yyyy date of birth (see dates.age)
+    try:
+        return dates.age(dob, today)
+    except ValueError:
+        raise AccountError(f"date of birth {dob!r} is not dd-mm-yyyy") from None
+
+
+def account_problem(name, dob, account_type, cents, today=None):
+    # The first rule a new account breaks, as a message, or None. Shared by
+    # check_new_account and bulk onboarding (onboard.validate).
+    if not name.strip():
+        return "name is required"
+    try:
+        years = dates.age(dob, today)
+    except ValueError:
+        return f"date of birth {dob!r} is not dd-mm-yyyy"
+    if years < MIN_AGE:
+        return f"must be at least {MIN_AGE} to open an account"
+    account_type = account_type.strip().lower()
+    minimum = MIN_OPENING.get(account_type)
+    if minimum is None:
+        return f"account type must be one of {', '.join(MIN_OPENING)}"
+    if cents < minimum:
+        return f"minimum opening deposit for {account_type} is {format_cents(minimum)}"
+    return amount_problem(cents)
+
+
+def amount_problem(cents):
+    if cents <= 0:
+        return "amount must be positive"
+    if cents > MAX_AMOUNT:
+        return f"amount may not exceed {format_cents(MAX_AMOUNT)}"
+    return None
+
+
+def check_new_account(req, today=None):
+    # Everything that can be checked without the store; raises AccountError
+    problem = account_problem(req.name, req.dob, req.account_type, req.deposit_cents, today)
+    if problem:
+        raise AccountError(problem)
+    security.check_pin_format(req.pin)
+
+
+def check_account_number(account_id):
+    if not valid_account_number(account_id):
+        raise AccountError(f"{account_id} is not a valid account number")
+
+
+def check_amount(cents):
+    problem = amount_problem(cents)
+    if problem:
+        raise AccountError(problem)
+
+
+# ================== Service ==================
+
+class BankService:
+    # The bank's operations as plain typed calls: no input(), no printing.
+    # Failures raise AccountError subclasses (see server.ERROR_STATUS for how
+    # each maps to HTTP). Calls block on disk and on the PIN KDF, so async
+    # callers run them on a thread pool.
+    def __init__(self, store, guard=None):
+        self.store = store
+        self.guard = guard or security.PinGuard(store)
+
+    def _login(self, account_id, pin):
+        check_account_number(account_id)
+        self.guard.verify(account_id, pin)
+
+    def create_account(self, req: NewAccount) -> AccountInfo:
+        check_new_account(req)
+        account_id = self.store.create_account(
+            name=req.name.strip(), dob=req.dob, address=req.address, phone=req.phone,
+            email=req.email, account_type=req.account_type.strip().lower(), cents=req.deposit_cents,
+            pin_hash=security.hash_pin(req.pin))
+        return self._info(account_id)
+
+    def _info(self, account_id):
+        a = self.store.get(account_id)
+        return AccountInfo(a.id, a.name, a.dob, a.address, a.phone, a.email, a.account_type)
+
+    def account_info(self, account_id: int, pin: str) -> AccountInfo:
+        self._login(account_id, pin)
+        return self._info(account_id)
+
+    def check_balance(self, account_id: int, pin: str) -> Balance:
+        self._login(account_id, pin)
+        return Balance(account_id, self.store.balance(account_id))
+
+    def deposit(self, account_id: int, cents: int) -> Balance:
+        # Anyone may pay into an account; no PIN
+        check_account_number(account_id)
+        check_amount(cents)
+        return Balance(account_id, self.store.deposit(account_id, cents))
+
+    def withdraw(self, account_id: int, pin: str, cents: int) -> Balance:
+        check_amount(cents)
+        self._login(account_id, pin)
+        return Balance(account_id, self.store.withdraw(account_id, cents))
+
+    def transfer(self, account_id: int, pin: str, to: int, cents: int) -> Balance:
+        check_amount(cents)
+        check_account_number(to)
+        self._login(account_id, pin)
+        return Balance(account_id, self.store.transfer(account_id, to, cents))
+
+    def change_pin(self, account_id: int, pin: str, new_pin: str) -> None:
+        check_account_number(account_id)
+        self.guard.change_pin(account_id, pin, new_pin)
+
+    def statement(self, account_id: int, pin: str, start: datetime.date, end: datetime.date,
+                  fmt: str = "text") -> Iterator[str]:
+        # Lines of a statement (see statements.FORMATS), produced as read
+        self._login(account_id, pin)
+        return statements.statement_lines(self.store, account_id, start, end, fmt)
@@ -0,0 +1,169 @@
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import runs
+import storage
+from accounts import AccountError
+from ledger import KIND_NAMES, format_cents
+
+
+# ================== Formats ==================
+
+# A statement covers whole days, start to end inclusive, local time. Both
+# formats are produced a line at a time straight off the store's history
+# cursor, so nothing is held beyond the current line.
+FORMATS = ("csv", "text")
+CSV_HEADER = "date,description,debit,credit,balance\n"
+RULE = "-" * 86 + "\n"
+
+
+def day_start(day):
+    return datetime.datetime.combine(day, datetime.time()).timestamp()
+
+
+def describe(kind, cents, counterparty):
+    if counterparty is not None:
+        return f"transfer {'to' if cents < 0 else 'from'} {counterparty}"
+    return KIND_NAMES[kind]
+
+
+def _csv(account, start, end, opening, rows):
+    yield CSV_HEADER
+    yield f"{start.isoformat()}T00:00:00,opening balance,,,{format_cents(opening)}\n"
+    balance = opening
+    for ts, kind, cents, balance, counterparty in rows:
+        debit, credit = (format_cents(-cents), "") if cents < 0 else ("", format_cents(cents))
+        when = datetime.datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+        yield (f"{when},{describe(kind, cents, counterparty)},{debit},{credit},"
+               f"{format_cents(balance)}\n")
+    yield f"{end.isoformat()}T23:59:59,closing balance,,,{format_cents(balance)}\n"
+
+
+def _text(account, start, end, opening, rows):
+    yield f"Statement for account {account.id} ({account.account_type})\n"
+    yield f"{account.name}\n"
+    yield f"Period {start:%d-%m-%Y} to {end:%d-%m-%Y}\n"
+    yield RULE
+    yield f"{'Date':<21}{'Description':<29}{'Debit':>12}{'Credit':>12}{'Balance':>12}\n"
+    yield f"{'':<21}{'Opening balance':<29}{'':>24}{format_cents(opening):>12}\n"
+    balance, count = opening, 0
+    for ts, kind, cents, balance, counterparty in rows:
+        debit, credit = (format_cents(-cents), "") if cents < 0 else ("", format_cents(cents))
+        when = datetime.datetime.fromtimestamp(ts).strftime("%d-%m-%Y %H:%M:%S")
+        yield (f"{when:<21}{describe(kind, cents, counterparty):<29}{debit:>12}{credit:>12}"
+               f"{format_cents(balance):>12}\n")
+        count += 1
+    yield f"{'':<21}{'Closing balance':<29}{'':>24}{format_cents(balance):>12}\n"
+    yield RULE
+    yield f"{count} transaction{'s' if count != 1 else ''}\n"
+
+
+def statement_lines(store, account_id, start, end, fmt="text"):
+    # Lines of the statement for dates start..end; validates eagerly so
+    # bad requests fail before anything is streamed
+    if fmt not in FORMATS:
+        raise AccountError(f"format must be one of {', '.join(FORMATS)}")
+    if end < start:
+        raise AccountError("statement end is before its start")
+    account = store.get(account_id)
+    opening, rows = store.history(account_id, day_start(start),
+                                  day_start(end + datetime.timedelta(days=1)))
+    return (_csv if fmt == "csv" else _text)(account, start, end, opening, rows)
+
+
+# ================== Mass runs ==================
+
+def _path(directory, account_id, fmt):
+    # About a thousand statements per subdirectory
+    return os.path.join(directory, str(account_id // 10_000),
+                        f"{account_id}.{'csv' if fmt == 'csv' else 'txt'}")
+
+
+def write_statements(store, account_ids, start, end, fmt, directory):
+    # One file per account, streamed; returns the number written
+    for account_id in account_ids:
+        path = _path(directory, account_id, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(statement_lines(store, account_id, start, end, fmt))
+    return len(account_ids)
+
+
+def _write_chunk(job):
+    return write_statements(runs.worker_store(), *job)
+
+
+def mass_run(store, start, end, directory, fmt="text", workers=None, chunk=1000):
+    # Statements for every account. Each worker holds one account's cursor
+    # at a time, so its memory is the same for ten accounts or ten million.
+    # Workers are forked from the store (runs.forked_pool); with one core,
+    # no fork() or workers=0, it all runs in-process.
+    report = runs.RunReport()
+    begin = time.perf_counter()
+    with store.lock:
+        ids = list(store.accounts.by_id)
+    jobs = ((ids[i:i + chunk], start, end, fmt, directory) for i in range(0, len(ids), chunk))
+    workers = runs.pool_size(workers)
+    if not workers:
+        for job in jobs:
+            report.accounts += write_statements(store, *job)
+    else:
+        with runs.forked_pool(store, workers) as pool:
+            for _, written in runs.ordered_results(pool, _write_chunk, jobs, 2 * workers):
+                report.accounts += written
+    report.seconds = time.perf_counter() - begin
+    return report
+
+
+# ================== Benchmark ==================
+
+def bench(accounts=20_000, entries=1_000_000, workers=None):
+    # One account with `entries` postings over a year: a one-day statement
+    # must cost the same as on an empty history. Then a mass run over all
+    # accounts, with the in-process peak memory for 1% vs 100% of them.
+    directory = tempfile.mkdtemp()
+    with storage.AccountStore(directory) as store:
+        ids = store.create_accounts([("bench", "01-01-1990", "-", "", "", "savings", 0, "")
+                                     for _ in range(accounts)])
+        # History is posted straight to the in-memory ledger with synthetic
+        # timestamps; nothing here needs to be durable
+        year = 365 * 86400
+        t0 = time.time() - year
+        busy = ids[0]
+        for i in range(entries):
+            store.ledger.deposit(busy, 100, ts=t0 + i * year / entries)
+        for i, account_id in enumerate(ids[1:]):
+            for j in range(20):
+                store.ledger.deposit(account_id, 100 + j, ts=t0 + (i * 20 + j) * year
+                                     / (accounts * 20))
+        end = datetime.date.today()
+        for label, start in (("1 day", end), ("30 days", end - datetime.timedelta(days=29)),
+                             ("366 days", end - datetime.timedelta(days=365))):
+            begin = time.perf_counter()
+            lines = sum(1 for _ in statement_lines(store, busy, start, end, "csv"))
+            elapsed = time.perf_counter() - begin
+            print(f"{entries:,}-entry account, {label:>8}: {lines - 3:>9,} rows in "
+                  f"{elapsed * 1000:8.1f} ms")
+
+        start = end - datetime.timedelta(days=365)
+        peaks = []
+        for n in (accounts // 100, accounts):
+            chunk = ids[1:n]
+            tracemalloc.start()
+            write_statements(store, chunk, start, end, "text", os.path.join(directory, "mem"))
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        print(f"peak memory writing {accounts // 100:,} vs {accounts:,} statements: "
+              f"{peaks[0] / 1024:.0f} KB vs {peaks[1] / 1024:.0f} KB")
+
+        report = mass_run(store, start, end, os.path.join(directory, "out"), "text", workers)
+        print(f"mass run: {report.accounts:,} statements (one of {entries:,} rows) in "
+              f"{report.seconds:.2f}s = {report.rate:,.0f} accounts/s")
+
+
+if __name__ == "__main__":
+    bench(*(int(a) for a in sys.argv[1:4]))
@@ -0,0 +1,572 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import replace
+
+# Account errors are re-exported: callers only need to know about the store
+from accounts import (Account, AccountError, AccountRepository, DuplicateAccount,
+                      InsufficientFunds, UnknownAccount, account_number, normalize_phone)
+from ledger import CASH, FEE, INTEREST, OPENING, TRANSFER, Ledger, format_cents
+
+
+# ================== Write-ahead log ==================
+
+# A log file is a sequence of framed records:
+#   len:u32 crc32:u32 lsn:u64 payload (compact JSON, utf-8)
+# crc covers lsn + payload. Replay stops at the first short or corrupt
+# frame (a write torn by a crash) and the file is truncated there.
+_FRAME = struct.Struct("<IIQ")
+_LSN = struct.Struct("<Q")
+
+
+def encode_record(lsn, record):
+    payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+    lsn_bytes = _LSN.pack(lsn)
+    return _FRAME.pack(len(payload), zlib.crc32(payload, zlib.crc32(lsn_bytes)), lsn) + payload
+
+
+def iter_log(f):
+    # Yields (lsn, record, end offset) for every intact frame
+    pos = f.tell()
+    while True:
+        header = f.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+            return
+        size, crc, lsn = _FRAME.unpack(header)
+        payload = f.read(size)
+        if len(payload) < size or zlib.crc32(payload, zlib.crc32(_LSN.pack(lsn))) != crc:
+            return
+        try:
+            record = json.loads(payload)
+        except ValueError:
+            return
+        pos += _FRAME.size + size
+        yield lsn, record, pos
+
+
+class WriteAheadLog:
+    # Group commit: append() only queues the encoded record; one flusher
+    # thread writes whatever has queued up and fsyncs once for the whole
+    # batch. While an fsync is in flight new commits pile up behind it, so
+    # the batch size grows with load instead of every commit paying a sync.
+    def __init__(self, path, next_lsn=1, sync=True):
+        self.path = path
+        self.sync = sync
+        self.file = open(path, "ab")
+        self.cond = threading.Condition()
+        self.buffer = []
+        self.next_lsn = next_lsn
+        self.durable_lsn = next_lsn - 1
+        self.error = None
+        self.closed = False
+        self.flushes = 0
+        self.thread = threading.Thread(target=self._run, name="wal-flusher", daemon=True)
+        self.thread.start()
+
+    def append(self, record):
+        # Returns the record's lsn; call wait(lsn) before acknowledging it
+        with self.cond:
+            if self.closed:
+                raise StorageError("log is closed")
+            if self.error is not None:
+                raise StorageError(f"log write failed: {self.error}")
+            lsn = self.next_lsn
+            self.next_lsn += 1
+            self.buffer.append(encode_record(lsn, record))
+            self.cond.notify_all()
+        return lsn
+
+    def wait(self, lsn):
+        with self.cond:
+            while self.durable_lsn < lsn and self.error is None:
+                self.cond.wait()
+            if self.durable_lsn < lsn:
+                raise StorageError(f"log write failed: {self.error}")
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.buffer and not self.closed:
+                    self.cond.wait()
+                if not self.buffer:
+                    return
+                batch, self.buffer = self.buffer, []
+                last = self.next_lsn - 1
+            try:
+                self.file.write(b"".join(batch))
+                self.file.flush()
+                if self.sync:
+                    os.fsync(self.file.fileno())
+            except OSError as exc:
+                with self.cond:
+                    self.error = exc
+                    self.cond.notify_all()
+                return
+            with self.cond:
+                self.durable_lsn = last
+                self.flushes += 1
+                self.cond.notify_all()
+
+    def flush(self):
+        with self.cond:
+            last = self.next_lsn - 1
+        self.wait(last)
+
+    def truncate(self):
+        # Drop everything on disk; the caller guarantees it is in a snapshot
+        self.flush()
+        with self.cond:
+            self.file.truncate(0)
+            self.file.seek(0)
+            if self.sync:
+                os.fsync(self.file.fileno())
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.file.close()
+
+
+# ================== Snapshots ==================
+
+def write_snapshot(path, lsn, state):
+    # tmp + fsync + rename, so a crash leaves either the old or the new one
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"lsn": lsn, "state": state}, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def read_snapshot(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            snap = json.load(f)
+    except FileNotFoundError:
+        return 0, None
+    return snap["lsn"], snap["state"]
+
+
+def _fsync_dir(path):
+    # Make the rename itself durable (not possible on Windows)
+    if sys.platform.startswith("win"):
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# ================== Account store ==================
+
+class StorageError(Exception):
+    pass
+
+
+SNAPSHOT_EVERY = 100_000  # log records between automatic snapshots
+LOCK_STRIPES = 1024
+
+
+class StripedLocks:
+    # A fixed pool of locks shared out by key hash: per-account locking
+    # without a lock object per account. Several keys are always taken in
+    # stripe order, so two transfers in opposite directions cannot deadlock.
+    def __init__(self, stripes=LOCK_STRIPES):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    @contextmanager
+    def hold(self, *keys):
+        stripes = sorted({hash(key) % len(self.locks) for key in keys})
+        yield from self._hold(stripes)
+
+    @contextmanager
+    def hold_all(self):
+        # Every account at once, e.g. for a batch touching thousands of them
+        yield from self._hold(range(len(self.locks)))
+
+    def _hold(self, stripes):
+        for i in stripes:
+            self.locks[i].acquire()
+        try:
+            yield
+        finally:
+            for i in reversed(stripes):
+                self.locks[i].release()
+
+
+class AccountStore:
+    # Accounts and the ledger live in memory; every change is first a log
+    # record. An operation validates under the striped locks of the accounts
+    # it touches, then appends and applies under self.lock, held only for
+    # that (so log order is apply order), and finally waits for the group
+    # commit holding no lock at all. Recovery = latest snapshot + the log
+    # records after it. Amounts are integer cents; balances come from the
+    # ledger. Once a log write fails, memory holds changes that can never be
+    # made durable, so the store fails: every call raises StorageError
+    # until it is reopened, which recovers what did reach the disk.
+    def __init__(self, directory, snapshot_every=SNAPSHOT_EVERY, sync=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "snapshot.json")
+        self.log_path = os.path.join(directory, "wal.log")
+        self.ledger_path = os.path.join(directory, "ledger.dat")
+        self.snapshot_every = snapshot_every
+        self.lock = threading.RLock()
+        self.account_locks = StripedLocks()
+
+        lsn, state = read_snapshot(self.snapshot_path)
+        if state:
+            self.accounts = AccountRepository.from_state(state["accounts"])
+            self.ledger = Ledger.load(self.ledger_path, state["ledger_entries"])
+            self.runs = state.get("runs", {})
+        else:
+            self.accounts = AccountRepository()
+            self.ledger = Ledger()
+            self.runs = {}  # batch run id -> {"through": last account id, "done", "cutoff"}
+        self.snapshot_lsn = lsn
+        last = self._recover(lsn)
+        self.since_snapshot = last - lsn
+        self.last_ts = max(self.ledger.ts, default=0.0)
+        self.wal = WriteAheadLog(self.log_path, next_lsn=last + 1, sync=sync)
+
+    def _recover(self, snapshot_lsn):
+        last, end = snapshot_lsn, 0
+        try:
+            with open(self.log_path, "rb") as f:
+                for lsn, record, end in iter_log(f):
+                    if lsn > snapshot_lsn:
+                        self._apply(record)
+                        last = lsn
+                size = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            return last
+        if end < size:
+            # Torn tail from a crash mid-write: nothing after it was acknowledged
+            with open(self.log_path, "r+b") as f:
+                f.truncate(end)
+        return last
+
+    # ---------- state machine ----------
+    def _apply(self, record):
+        op = record["op"]
+        if op == "create":
+            self.accounts.add(Account(record["id"], record["name"], record["dob"],
+                                      record["address"], record["phone"], record["email"],
+                                      record["account_type"], record.get("pin_hash", "")))
+            if record["amount"]:
+                self.ledger.deposit(record["id"], record["amount"], record["ts"], kind=OPENING)
+        elif op == "create_batch":
+            # accounts: [[id, name, dob, address, phone, email, account_type,
+            # pin_hash], ...] and their opening deposits, posted as one
+            # transaction
+            batch = record["accounts"]
+            self.accounts.add_many([Account(*fields) for fields in batch])
+            postings = [(fields[0], amount)
+                        for fields, amount in zip(batch, record["amounts"]) if amount]
+            if postings:
+                postings.append((CASH, -sum(amount for _, amount in postings)))
+                self.ledger.post(OPENING, postings, record["ts"])
+        elif op == "deposit":
+            self.ledger.deposit(record["id"], record["amount"], record["ts"])
+        elif op == "withdraw":
+            self.ledger.withdraw(record["id"], record["amount"], record["ts"])
+        elif op == "transfer":
+            self.ledger.transfer(record["id"], record["to"], record["amount"], record["ts"])
+        elif op == "eod":
+            ts = record["ts"]
+            for kind, sign, postings in ((INTEREST, 1, record["interest"]),
+                                         (FEE, -1, record["fees"])):
+                if postings:
+                    postings = [(account, sign * cents) for account, cents in postings]
+                    postings.append((CASH, -sum(cents for _, cents in postings)))
+                    self.ledger.post(kind, postings, ts)
+            self.runs[record["run"]] = {"through": record["through"], "done": record["done"],
+                                        "cutoff": record.get("cutoff")}
+        elif op == "pin":
+            self.accounts.by_id[record["id"]].pin_hash = record["pin_hash"]
+        else:
+            raise StorageError(f"unknown log record {op!r}")
+
+    def _check(self):
+        if self.wal.error is not None:
+            raise StorageError(f"store failed, reopen it: log write failed: {self.wal.error}")
+
+    def _commit(self, record):
+        # Caller has validated the record. The timestamp is part of it, so
+        # replay posts exactly the same entries. It never goes backwards,
+        # even if the clock is stepped back: the ledger's time queries
+        # bisect on it.
+        with self.lock:
+            record["ts"] = self.last_ts = max(time.time(), self.last_ts)
+            lsn = self.wal.append(record)
+            self._apply(record)
+            self.since_snapshot += 1
+            if self.since_snapshot >= self.snapshot_every:
+                self.checkpoint()
+        return lsn
+
+    # ---------- operations ----------
+    def create_account(self, name, dob, address, phone, email, account_type, cents, pin_hash=""):
+        if cents < 0:
+            raise AccountError("opening deposit cannot be negative")
+        with self.lock:
+            self.accounts.check_unique(phone, email)
+            account_id = self.accounts.new_id()
+            lsn = self._commit({"op": "create", "id": account_id, "name": name, "dob": dob,
+                                "address": address, "phone": phone, "email": email,
+                                "account_type": account_type, "amount": cents,
+                                "pin_hash": pin_hash})
+        self.wal.wait(lsn)
+        return account_id
+
+    def create_accounts(self, rows):
+        # Bulk onboarding: rows are (name, dob, address, phone, email,
+        # account_type, cents, pin_hash), already validated. The batch is one
+        # log record, so it is durable or lost as a whole. Returns the new
+        # ids in row order, None where the phone or email is already taken
+        # (by an existing account or an earlier row).
+        ids, accepted, amounts = [], [], []
+        with self.lock:
+            repo = self.accounts
+            seq = repo.next_seq
+            phones, emails = set(), set()
+            for name, dob, address, phone, email, account_type, cents, pin_hash in rows:
+                p = phone if phone.isdigit() else normalize_phone(phone)
+                e = email.strip().lower()
+                if (p and (p in repo.by_phone or p in phones)) or \
+                        (e and (e in repo.by_email or e in emails)):
+                    ids.append(None)
+                    continue
+                phones.add(p)
+                emails.add(e)
+                account_id = account_number(seq)
+                seq += 1
+                ids.append(account_id)
+                accepted.append([account_id, name, dob, address, phone, email, account_type,
+                                 pin_hash])
+                amounts.append(cents)
+            if not accepted:
+                return ids
+            lsn = self._commit({"op": "create_batch", "accounts": accepted, "amounts": amounts})
+        self.wal.wait(lsn)
+        return ids
+
+    # ---------- batch runs ----------
+    def run_progress(self, run):
+        # (last account id processed, finished?, cutoff) for a batch run such
+        # as end of day; (0, False, None) if it never started. The cutoff is
+        # whatever the run's first chunk recorded, for resumes to reuse.
+        with self.lock:
+            self._check()
+            progress = self.runs.get(run)
+        if not progress:
+            return 0, False, None
+        return progress["through"], progress["done"], progress.get("cutoff")
+
+    def balances_at(self, account_ids, ts):
+        # [(account_type, balance at ts)] for a chunk, under one lock hold
+        with self.lock:
+            self._check()
+            by_id, balance_at = self.accounts.by_id, self.ledger.balance_at
+            return [(by_id[a].account_type, balance_at(a, ts)) for a in account_ids]
+
+    def post_run(self, run, through, interest, fees, done=False, cutoff=None):
+        # Posts one chunk of a batch run: interest credits and fee debits as
+        # [(account, cents)], plus the run's progress and balance cutoff, in
+        # one log record, so a chunk and its progress mark are durable
+        # together and a resumed run never posts a chunk twice. Fees are
+        # capped at the balance at posting time, never overdrawing. Returns
+        # the fees actually charged.
+        with self.account_locks.hold_all():
+            if self.runs.get(run, {}).get("done"):
+                raise StorageError(f"run {run} has already finished")
+            balance = self.ledger.balance
+            fees = [(a, min(cents, balance(a))) for a, cents in fees]
+            fees = [(a, cents) for a, cents in fees if cents > 0]
+            lsn = self._commit({"op": "eod", "run": run, "through": through, "done": done,
+                                "cutoff": cutoff, "interest": interest, "fees": fees})
+        self.wal.wait(lsn)
+        return fees
+
+    def _check_funds(self, account_id, cents):
+        self._check()
+        balance = self.ledger.balance(account_id)
+        if cents > balance:
+            raise InsufficientFunds(f"balance is {format_cents(balance)}")
+
+    def deposit(self, account_id, cents):
+        # All three return the account's balance afterwards, in cents
+        if cents <= 0:
+            raise AccountError("deposit must be positive")
+        with self.account_locks.hold(account_id):
+            self.accounts.get(account_id)
+            lsn = self._commit({"op": "deposit", "id": account_id, "amount": cents})
+            balance = self.ledger.balance(account_id)
+        self.wal.wait(lsn)
+        return balance
+
+    def withdraw(self, account_id, cents):
+        if cents <= 0:
+            raise AccountError("withdrawal must be positive")
+        with self.account_locks.hold(account_id):
+            self.accounts.get(account_id)
+            self._check_funds(account_id, cents)
+            lsn = self._commit({"op": "withdraw", "id": account_id, "amount": cents})
+            balance = self.ledger.balance(account_id)
+        self.wal.wait(lsn)
+        return balance
+
+    def transfer(self, src, dst, cents):
+        if cents <= 0:
+            raise AccountError("transfer must be positive")
+        if src == dst:
+            raise AccountError("cannot transfer to the same account")
+        with self.account_locks.hold(src, dst):
+            self.accounts.get(src)
+            self.accounts.get(dst)
+            self._check_funds(src, cents)
+            lsn = self._commit({"op": "transfer", "id": src, "to": dst, "amount": cents})
+            balance = self.ledger.balance(src)
+        self.wal.wait(lsn)
+        return balance
+
+    def set_pin(self, account_id, pin_hash):
+        # Takes a hash (security.hash_pin), never a PIN
+        with self.account_locks.hold(account_id):
+            self.accounts.get(account_id)
+            lsn = self._commit({"op": "pin", "id": account_id, "pin_hash": pin_hash})
+        self.wal.wait(lsn)
+
+    def pin_hash(self, account_id):
+        self._check()
+        return self.accounts.get(account_id).pin_hash
+
+    def balance(self, account_id):
+        self._check()
+        self.accounts.get(account_id)
+        return self.ledger.balance(account_id)
+
+    def balance_at(self, account_id, ts):
+        with self.lock:
+            self._check()
+            self.accounts.get(account_id)
+            return self.ledger.balance_at(account_id, ts)
+
+    def history(self, account_id, start, end):
+        # Time-indexed cursor for statements: the balance at start, and an
+        # iterator of (ts, kind, cents, balance after, counterparty or None)
+        # for each posting with start <= ts < end. Only the starting point
+        # and the account's posting count are taken under the lock; the walk
+        # reads the append-only ledger, so it blocks no writer and its
+        # memory does not grow with the range. Postings made after the call
+        # are left out: every transaction up to that count is complete,
+        # where a later transfer could be half appended.
+        with self.lock:
+            self._check()
+            self.accounts.get(account_id)
+            ledger = self.ledger
+            opening = ledger.balance_after(account_id, ledger.count_before(account_id, start))
+            stop = len(ledger.postings.get(account_id, ()))
+        return opening, self._walk(account_id, start, end, opening, stop)
+
+    def _walk(self, account_id, start, end, balance, stop):
+        ledger = self.ledger
+        ts, kind, amount = ledger.ts, ledger.kind, ledger.amount
+        for n in ledger.cursor(account_id, start, end, stop):
+            balance += amount[n]
+            yield (ts[n], kind[n], amount[n], balance,
+                   ledger.counterparty(n) if kind[n] == TRANSFER else None)
+
+    # Reads return copies, so callers never see (or make) unlogged changes
+    def get(self, account_id):
+        with self.lock:
+            self._check()
+            return replace(self.accounts.get(account_id))
+
+    def find_by_phone(self, phone):
+        with self.lock:
+            self._check()
+            account = self.accounts.find_by_phone(phone)
+            return account and replace(account)
+
+    def find_by_email(self, email):
+        with self.lock:
+            self._check()
+            account = self.accounts.find_by_email(email)
+            return account and replace(account)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    # ---------- snapshots ----------
+    def checkpoint(self):
+        # Blocks writers while the state is written; the log is then
+        # emptied, since everything in it is covered by the snapshot.
+        with self.lock:
+            self.wal.flush()
+            lsn = self.wal.next_lsn - 1
+            # Ledger entries first: the snapshot only counts what is on disk
+            entries = self.ledger.write(self.ledger_path)
+            write_snapshot(self.snapshot_path, lsn, {"accounts": self.accounts.to_state(),
+                                                     "ledger_entries": entries,
+                                                     "runs": self.runs})
+            self.wal.truncate()
+            self.snapshot_lsn = lsn
+            self.since_snapshot = 0
+
+    def close(self):
+        self.wal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ================== Benchmark ==================
+
+def bench(threads_list=(1, 4, 16, 64), seconds=2.0):
+    import tempfile
+
+    for threads in threads_list:
+        directory = tempfile.mkdtemp()
+        with AccountStore(directory) as store:
+            ids = [store.create_account("bench", "01-01-1990", "-", str(i), f"{i}@x", "savings",
+                                        100_000) for i in range(threads)]
+            flushes0 = store.wal.flushes
+            counts = [0] * threads
+            deadline = time.perf_counter() + seconds
+
+            def worker(i):
+                while time.perf_counter() < deadline:
+                    store.deposit(ids[i], 100)
+                    counts[i] += 1
+
+            start = time.perf_counter()
+            pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - start
+            commits = sum(counts)
+            flushes = store.wal.flushes - flushes0
+        print(f"threads={threads:3d}  {commits / elapsed:10,.0f} commits/s  "
+              f"{flushes / elapsed:8,.0f} fsyncs/s  {commits / max(flushes, 1):6.1f} commits/fsync")
+
+
+if __name__ == "__main__":
+    bench()
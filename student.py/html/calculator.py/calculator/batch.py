@@ -0,0 +1,155 @@
+import argparse
+import csv
+import itertools
+import sys
+import time
+
+import numpy as np
+
+import geometry
+import vectorized
+
+
+# ================== Streaming pipeline ==================
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def _parse_column(cells):
+    # Fast path parses the whole column at once; bad cells become NaN
+    try:
+        return np.array(cells, dtype=np.float64)
+    except ValueError:
+        out = np.empty(len(cells), dtype=np.float64)
+        for i, cell in enumerate(cells):
+            try:
+                out[i] = float(cell)
+            except ValueError:
+                out[i] = np.nan
+        return out
+
+
+def _format_column(values, valid):
+    cells = values.tolist()
+    if not valid.all():
+        for i in np.flatnonzero(~valid).tolist():
+            cells[i] = ""
+    return cells
+
+
+def _pad(row, width):
+    # Keep result columns aligned for short/ragged input rows
+    if len(row) == width:
+        return row
+    return (row + [""] * width)[:width]
+
+
+def iter_chunks(reader, size):
+    while True:
+        chunk = list(itertools.islice(reader, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def process_chunk(shape, params, indices, rows):
+    columns = {}
+    for name, idx in zip(params, indices):
+        columns[name] = _parse_column([row[idx] if idx < len(row) else "" for row in rows])
+    result = vectorized.compute(shape, **columns)
+    return [_format_column(field, result.valid) for field in result.values]
+
+
+def write_chunks(writer, shape, params, indices, width, reader, chunk_size, progress=None):
+    # Input rows with their results appended, chunk by chunk; returns the row count
+    rows_done = 0
+    for rows in iter_chunks(reader, chunk_size):
+        fields = process_chunk(shape, params, indices, rows)
+        writer.writerows(_pad(row, width) + list(out) for row, out in zip(rows, zip(*fields)))
+        rows_done += len(rows)
+        if progress is not None:
+            progress(rows_done)
+    return rows_done
+
+
+def run(shape, infile, outfile, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    _, params, result_type = geometry.SHAPES[shape]
+    reader = csv.reader(infile)
+    writer = csv.writer(outfile, lineterminator="\n")
+
+    header = next(reader, None)
+    if header is None:
+        return 0
+    header = [h.strip() for h in header]
+    missing = [p for p in params if p not in header]
+    if missing:
+        raise ValueError(f"{shape}: input is missing column(s) {', '.join(missing)}")
+    indices = [header.index(p) for p in params]
+    writer.writerow(header + list(result_type._fields))
+    return write_chunks(writer, shape, params, indices, len(header), reader, chunk_size, progress)
+
+
+# ================== CLI ==================
+
+def _open(path, mode):
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m calculator batch",
+        description="Stream a CSV of shape dimensions through the geometry formulas.")
+    parser.add_argument("--shape", required=True, choices=sorted(geometry.SHAPES))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="evaluate shards of the input file in N processes (0 = all cores)")
+    parser.add_argument("--shard-bytes", type=int, default=None,
+                        help="input bytes per worker shard (with --workers)")
+    parser.add_argument("--quiet", action="store_true", help="do not report throughput")
+    parser.add_argument("input", nargs="?", default="-", help="input CSV, '-' for stdin")
+    parser.add_argument("output", nargs="?", default="-", help="output CSV, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    last_report = [start]
+
+    def progress(rows):
+        now = time.perf_counter()
+        if now - last_report[0] >= 1.0:
+            last_report[0] = now
+            print(f"\r{rows:,} rows  {rows / (now - start):,.0f} rows/s",
+                  end="", file=sys.stderr, flush=True)
+
+    if args.workers != 1 and args.input == "-":
+        parser.error("--workers needs an input file (stdin cannot be sharded)")
+
+    infile = _open(args.input, "r") if args.workers == 1 else None
+    outfile = _open(args.output, "w")
+    try:
+        if infile is not None:
+            rows = run(args.shape, infile, outfile, args.chunk_size,
+                       progress=None if args.quiet else progress)
+        else:
+            import parallel
+            rows = parallel.write_csv(
+                args.shape, args.input, outfile, workers=args.workers or None,
+                shard_bytes=args.shard_bytes or parallel.DEFAULT_SHARD_BYTES,
+                chunk_size=args.chunk_size, progress=None if args.quiet else progress)
+    except ValueError as exc:
+        parser.error(str(exc))
+    finally:
+        if infile not in (None, sys.stdin):
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    if not args.quiet:
+        elapsed = time.perf_counter() - start
+        print(f"\r{rows:,} rows in {elapsed:.2f}s  "
+              f"({rows / elapsed if elapsed else 0:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ================== Import time ==================
+
+IMPORT_SNIPPET = """
+import time
+t = time.perf_counter()
+import calculator
+print((time.perf_counter() - t) * 1000)
+"""
+
+
+def import_time(runs=10):
+    # Fresh interpreter per run with no display, so this also proves that
+    # importing the module never creates a Tk root or enters a mainloop.
+    env = {k: v for k, v in os.environ.items() if k != "DISPLAY"}
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=HERE, env=env,
+                             capture_output=True, text=True, timeout=30, check=True)
+        samples.append(float(out.stdout.strip()))
+    print(f"import calculator: median {statistics.median(samples):.1f} ms, "
+          f"min {min(samples):.1f} ms over {runs} runs")
+    return samples
+
+
+# ================== Startup time ==================
+
+STARTUP_SNIPPET = """
+import json, time
+t = time.perf_counter()
+import calculator
+import_ms = (time.perf_counter() - t) * 1000
+app = calculator.GeometryApp()
+app.update()  # runs the first-frame idle callback
+print(json.dumps({"import": import_ms, "first_frame": app.profiler.total(),
+                  "phases": app.profiler.phases}))
+app.destroy()
+"""
+
+
+def startup_time(runs=10):
+    # Cold start = import + GeometryApp() up to its first painted frame.
+    # Needs a display (a real one or Xvfb).
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        print("startup: skipped, no DISPLAY")
+        return None
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET], cwd=HERE,
+                             capture_output=True, text=True, timeout=60, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    cold = [r["import"] + r["first_frame"] for r in results]
+    print(f"cold start: median {statistics.median(cold):.1f} ms, "
+          f"min {min(cold):.1f} ms over {runs} runs")
+    print(f"  {'import':<20} {statistics.median(r['import'] for r in results):8.1f} ms")
+    for i, (phase, _) in enumerate(results[0]["phases"]):
+        ms = statistics.median(r["phases"][i][1] for r in results)
+        print(f"  {phase:<20} {ms:8.1f} ms")
+    return results
+
+
+if __name__ == "__main__":
+    import_time()
+    startup_time()
@@ -1,6 +1,13 @@
 import math
+import sys
+import time
+from collections import OrderedDict
 import tkinter as tk
-from tkinter import ttk, messagebox, colorchooser, simpledialog
+from tkinter import ttk, messagebox
+
+import geometry
+import render3d
+import whiteboard
 
 
 # ================== Utility ==================
@@ -10,7 +17,10 @@ def float_input(entry, name):
     if val == "":
         raise ValueError
     try:
-        return float(val)
+        number = float(val)
+        if not math.isfinite(number):  # float() accepts "nan" and "inf"
+            raise ValueError(val)
+        return number
     except ValueError:
         messagebox.showerror("Input Error", f"Please enter a valid number for {name}.")
         raise
@@ -18,8 +28,28 @@ def float_input(entry, name):
 
 # ================== Whiteboard (pen/erase/color/text) ==================
 
+MIN_POINT_DIST = 2.0    # px between recorded points while dragging
+SIMPLIFY_EPSILON = 0.75  # px tolerance for simplifying a finished stroke
+ERASER_SCALE = 2.0      # eraser radius = width slider × this
+AUTOSAVE_MS = 5000      # how often new strokes are appended to the board file
+WHITEBOARD_FILES = [("Whiteboard", "*.wbd"), ("All files", "*.*")]
+TILE_CACHE_SIZE = 128   # rendered tiles kept across pans and zoom levels
+TILE_BUDGET_MS = 8      # tile rendering per idle pass before yielding to input
+UNDO_BUDGET = 16 * 1024 * 1024  # bytes of stroke data undo history may keep alive
+BULK_UNDO = 256         # items per undo step above which the board is rebuilt
+
+
 class WhiteboardFrame(ttk.Frame):
-    def __init__(self, parent):
+    # The StrokeStore is the source of truth, in board units. Finished strokes
+    # are shown as raster tiles of the current zoom level (cached, rendered
+    # from the store on demand); only the stroke being drawn, and a finished
+    # one until its tiles have been redrawn, are vector items. Text stays as
+    # canvas items (self.items maps store id -> item). The grid index is in
+    # board units and keyed by store id.
+    #
+    # Canvas coordinates are board units × self.scale; panning only moves
+    # the canvas view (scan_mark/scan_dragto), so it never touches an item.
+    def __init__(self, parent, path=None):
         super().__init__(parent)
 
         top_bar = ttk.Frame(self)
@@ -41,82 +71,583 @@ class WhiteboardFrame(ttk.Frame):
 
         clear_btn = ttk.Button(top_bar, text="Clear", command=self.clear_board)
         clear_btn.pack(side="right", padx=4)
+        ttk.Button(top_bar, text="Redo", command=self.redo).pack(side="right", padx=2)
+        ttk.Button(top_bar, text="Undo", command=self.undo).pack(side="right", padx=2)
+        ttk.Button(top_bar, text="Save", command=self.save_board).pack(side="right", padx=2)
+        ttk.Button(top_bar, text="Open", command=self.open_board).pack(side="right", padx=2)
+        ttk.Button(top_bar, text="1:1", command=self.reset_view).pack(side="right", padx=2)
 
-        self.canvas = tk.Canvas(self, bg="white", cursor="pencil")
+        self.canvas = tk.Canvas(self, bg="white", cursor="pencil", confine=False)
         self.canvas.pack(fill="both", expand=True)
 
-        self.old_x = None
-        self.old_y = None
+        # Stroke in progress: one polyline item, extended with coords()
+        self.stroke_item = None
+        self.stroke_points = None  # canvas coordinates while drawing
+        self.flush_job = None
         self.pen_color = "black"
 
+        self.store = whiteboard.StrokeStore()
+        self.items = {}    # store id -> canvas item (text)
+        self.overlay = {}  # store id -> vector item shown until its tiles are redrawn
+        self.index = whiteboard.SpatialGrid()
+        self.history = whiteboard.History(UNDO_BUDGET)
+        self.erase_pos = None
+
+        # View and tiles
+        self.level = 0
+        self.scale = 1.0
+        self.tiles = whiteboard.TileCache(TILE_CACHE_SIZE)
+        self.tile_items = {}  # tile key -> image item (None for a blank tile)
+        self.visible = set()
+        self.pending = OrderedDict()  # tile keys waiting to be rendered
+        self.rendering = None  # (key, TileRenderer) of the tile being rendered
+        self.render_job = None
+        self.rgb = {}
+
+        self.path = None
+        self.autosave_job = None
+
         self.canvas.bind("<Button-1>", self.on_click)
         self.canvas.bind("<B1-Motion>", self.on_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_release)
+        for button in (2, 3):
+            self.canvas.bind(f"<Button-{button}>", self.on_pan_start)
+            self.canvas.bind(f"<B{button}-Motion>", self.on_pan)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Button-4>", self.on_wheel)
+        self.canvas.bind("<Button-5>", self.on_wheel)
+        self.canvas.bind("<Configure>", lambda event: self.update_tiles())
+        self.canvas.bind("<Control-z>", lambda event: self.undo())
+        self.canvas.bind("<Control-y>", lambda event: self.redo())
+        self.canvas.bind("<Control-Z>", lambda event: self.redo())
+
+        if path is not None:
+            self.load_board(path)
 
     def choose_color(self):
+        from tkinter import colorchooser  # deferred: only needed on first pick
         color = colorchooser.askcolor(initialcolor=self.pen_color)[1]
         if color:
             self.pen_color = color
 
+    def to_board(self, event):
+        return (self.canvas.canvasx(event.x) / self.scale,
+                self.canvas.canvasy(event.y) / self.scale)
+
     def on_click(self, event):
+        self.canvas.focus_set()  # for the undo/redo keys
         mode = self.mode_var.get()
         if mode == "text":
             # Ask text once at the click position
+            from tkinter import simpledialog
             text = simpledialog.askstring("Text", "Enter text:")
             if text:
-                self.canvas.create_text(event.x, event.y, text=text,
-                                        fill=self.pen_color, anchor="nw")
+                sid = self.store.add_text(*self.to_board(event), text, self.pen_color)
+                self._draw_item(sid)
+                self.history.added(sid)
+                self._commit()
+        elif mode == "eraser":
+            # The whole drag is one undo step
+            self.history.begin()
+            self.erase_pos = self.to_board(event)
+            self.erase_at(*self.erase_pos)
         else:
-            self.old_x, self.old_y = event.x, event.y
+            self.stroke_points = [self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)]
+            self.stroke_item = None
 
     def on_drag(self, event):
         mode = self.mode_var.get()
-        if mode == "text":
+        if mode == "eraser" and self.erase_pos is not None:
+            self.erase_along(*self.to_board(event))
+            return
+        if mode == "text" or self.stroke_points is None:
+            return
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        if not whiteboard.far_enough(self.stroke_points, x, y, MIN_POINT_DIST):
             return
-        if self.old_x is not None and self.old_y is not None:
-            width = self.width_scale.get()
-            color = "white" if mode == "eraser" else self.pen_color
-            self.canvas.create_line(self.old_x, self.old_y, event.x, event.y,
-                                    fill=color, width=width,
-                                    capstyle=tk.ROUND, smooth=True)
-            self.old_x, self.old_y = event.x, event.y
+        self.stroke_points += [x, y]
+        if self.stroke_item is None:
+            self.stroke_width = self.width_scale.get()
+            self.stroke_item = self._create_line(self.stroke_points, self.pen_color,
+                                                 self.stroke_width)
+        elif self.flush_job is None:
+            # Coalesce motion events: push the points to Tk once per idle pass
+            self.flush_job = self.after_idle(self._flush_stroke)
+
+    def _flush_stroke(self):
+        self.flush_job = None
+        if self.stroke_item is not None:
+            self.canvas.coords(self.stroke_item, *self.stroke_points)
 
     def on_release(self, event):
-        self.old_x, self.old_y = None, None
+        if self.erase_pos is not None:
+            self.erase_pos = None
+            self._commit()
+        if self.flush_job is not None:
+            self.after_cancel(self.flush_job)
+            self.flush_job = None
+        if self.stroke_item is not None:
+            # Width and tolerance are screen pixels at the current zoom
+            s = self.scale
+            points = whiteboard.simplify([v / s for v in self.stroke_points],
+                                         SIMPLIFY_EPSILON / s)
+            self.canvas.coords(self.stroke_item, *(v * s for v in points))
+            sid = self.store.add_stroke(points, self.pen_color, self.stroke_width / s)
+            self.overlay[sid] = self.stroke_item
+            self._draw_item(sid)
+            if self.render_job is None:
+                # Nothing visible to redraw: the overlay goes on the next pass
+                self.render_job = self.after_idle(self._render_pending)
+            self.history.added(sid)
+            self._commit()
+        self.stroke_item = None
+        self.stroke_points = None
+
+    def _create_line(self, points, color, width):
+        # Not smoothed, so it matches the tiles that replace it
+        return self.canvas.create_line(*points, fill=color, width=width,
+                                       capstyle=tk.ROUND, joinstyle=tk.ROUND)
+
+    def _draw_item(self, sid):
+        # Index a store entry; text gets a canvas item, strokes dirty their tiles
+        rec = self.store.get(sid)
+        s = self.scale
+        if rec.kind == whiteboard.KIND_TEXT:
+            x, y = rec.points
+            item = self.canvas.create_text(x * s, y * s, text=rec.text, fill=rec.color, anchor="nw")
+            self.items[sid] = item
+            self.index.insert_box(sid, *(v / s for v in self.canvas.bbox(item)))
+        else:
+            self.index.insert_polyline(sid, rec.points, pad=rec.width / 2)
+            self.invalidate(rec.points, rec.width / 2)
 
-    def clear_board(self):
+    def redraw(self):
         self.canvas.delete("all")
+        self.items.clear()
+        self.overlay.clear()
+        self.index.clear()
+        self._reset_tiles()
+        for sid in self.store.ids():
+            self._draw_item(sid)
+        self.update_tiles()
+
+    # ---------- TILES ----------
+    def _reset_tiles(self):
+        self.tiles.clear()
+        self.tile_items.clear()
+        self.pending.clear()
+        self.rendering = None
+
+    def _rgb_of(self, color):
+        rgb = self.rgb.get(color)
+        if rgb is None:
+            rgb = self.rgb[color] = tuple(v >> 8 for v in self.canvas.winfo_rgb(color))
+        return rgb
+
+    def update_tiles(self):
+        # Show the tiles covering the view: cached ones at once, the rest
+        # are queued and filled in progressively
+        x0, y0 = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        keys = whiteboard.tiles_in_rect(self.level, x0, y0,
+                                        x0 + self.canvas.winfo_width(),
+                                        y0 + self.canvas.winfo_height())
+        self.visible = set(keys)
+        for key in list(self.tile_items):
+            if key not in self.visible:
+                self._hide_tile(key)
+        for key in keys:
+            if key in self.tile_items:
+                continue
+            if key in self.tiles:
+                self._show_tile(key, self.tiles.get(key))
+            else:
+                self._queue(key)
+
+    def invalidate(self, points, pad):
+        # Drop cached tiles under a changed stroke; visible ones keep their
+        # old image until the re-render replaces it, so nothing flickers. A
+        # half-rendered tile works from a copy of the old strokes: restart it.
+        rect = whiteboard.bbox(points, pad)
+        for key in self.tiles.invalidate(*rect):
+            if key in self.tile_items:
+                self._queue(key)
+        if self.rendering is not None and whiteboard.tile_overlaps(self.rendering[0], *rect):
+            key = self.rendering[0]
+            self.rendering = None
+            self.pending[key] = None
+            self.pending.move_to_end(key, last=False)
+
+    def _queue(self, key):
+        self.pending[key] = None
+        if self.render_job is None:
+            self.render_job = self.after_idle(self._render_pending)
+
+    def _render_pending(self):
+        # Render within a time budget per pass so input stays responsive; a
+        # tile that takes longer is finished over several passes
+        self.render_job = None
+        deadline = time.perf_counter() + TILE_BUDGET_MS / 1000
+        while self.pending or self.rendering is not None:
+            if self.rendering is None:
+                key, _ = self.pending.popitem(last=False)
+                if key in self.visible:
+                    self.rendering = key, whiteboard.TileRenderer(self.store, self.index, key,
+                                                                  self._rgb_of)
+            elif self.rendering[0] not in self.visible:
+                self.rendering = None
+            else:
+                key, renderer = self.rendering
+                if renderer.step():
+                    self.rendering = None
+                    self._set_tile(key, renderer.data())
+            if time.perf_counter() > deadline:
+                break
+        if self.pending or self.rendering is not None:
+            self.render_job = self.after(1, self._render_pending)
+        else:
+            # Every visible tile is current: the vector copies can go
+            for item in self.overlay.values():
+                self.canvas.delete(item)
+            self.overlay.clear()
+
+    def _set_tile(self, key, data):
+        image = None if data is None else tk.PhotoImage(master=self.canvas, data=data, format="PPM")
+        for old in self.tiles.put(key, image):
+            self._hide_tile(old)
+        self._show_tile(key, image)
+
+    def _show_tile(self, key, image):
+        item = self.tile_items.get(key)
+        if image is None:
+            if item is not None:
+                self.canvas.delete(item)
+        elif item is None:
+            _, tx, ty = key
+            item = self.canvas.create_image(tx * whiteboard.TILE, ty * whiteboard.TILE,
+                                            image=image, anchor="nw")
+            self.canvas.tag_lower(item)
+        else:
+            self.canvas.itemconfigure(item, image=image)
+        self.tile_items[key] = item if image is not None else None
+
+    def _hide_tile(self, key):
+        item = self.tile_items.pop(key, None)
+        if item is not None:
+            self.canvas.delete(item)
+
+    # ---------- ZOOM / PAN ----------
+    def on_pan_start(self, event):
+        self.canvas.scan_mark(event.x, event.y)
+
+    def on_pan(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.update_tiles()
+
+    def on_wheel(self, event):
+        step = 1 if event.num == 4 or event.delta > 0 else -1
+        self.set_zoom(self.level + step, event.x, event.y)
+
+    def _scroll_by(self, dx, dy):
+        self.canvas.scan_mark(0, 0)
+        self.canvas.scan_dragto(-round(dx), -round(dy), gain=1)
+
+    def set_zoom(self, level, x, y):
+        # Zoom about window point (x, y), which keeps showing the same board point
+        level = min(max(level, whiteboard.MIN_ZOOM), whiteboard.MAX_ZOOM)
+        if level == self.level:
+            return
+        old, new = self.scale, whiteboard.zoom_scale(level)
+        cx, cy = self.canvas.canvasx(x), self.canvas.canvasy(y)
+        self.level, self.scale = level, new
+        self._scroll_by(cx * new / old - cx, cy * new / old - cy)
+
+        # Tiles of the old level stay cached for zooming back
+        for key in list(self.tile_items):
+            self._hide_tile(key)
+        self.pending.clear()
+        self.rendering = None
+        for item in self.overlay.values():
+            self.canvas.delete(item)
+        self.overlay.clear()
+        for sid, item in self.items.items():
+            x, y = self.store.stroke_points(sid)
+            self.canvas.coords(item, x * new, y * new)
+        if self.stroke_points is not None:
+            # A stroke in progress, drawn on screen or still a single press
+            self.stroke_points = [v * new / old for v in self.stroke_points]
+        if self.stroke_item is not None:
+            self.canvas.coords(self.stroke_item, *self.stroke_points)
+            self.stroke_width *= new / old
+            self.canvas.itemconfigure(self.stroke_item, width=self.stroke_width)
+        self.update_tiles()
+
+    def reset_view(self):
+        self.set_zoom(0, 0, 0)
+        self._scroll_by(-self.canvas.canvasx(0), -self.canvas.canvasy(0))
+        self.update_tiles()
+
+    # ---------- ERASER ----------
+    def eraser_radius(self):
+        # In board units: the eraser is the same size on screen at any zoom
+        return max(2.0, self.width_scale.get() * ERASER_SCALE) / self.scale
+
+    def erase_along(self, x, y):
+        # Step along the drag so fast mouse moves do not skip strokes
+        x0, y0 = self.erase_pos
+        r = self.eraser_radius()
+        steps = max(1, int(math.hypot(x - x0, y - y0) / r))
+        for i in range(1, steps + 1):
+            self.erase_at(x0 + (x - x0) * i / steps, y0 + (y - y0) * i / steps)
+        self.erase_pos = (x, y)
+
+    def erase_at(self, x, y):
+        r = self.eraser_radius()
+        for sid in self.index.query(x - r, y - r, x + r, y + r):
+            rec = self.store.get(sid)
+            if rec.kind == whiteboard.KIND_TEXT:
+                bbox = self.canvas.bbox(self.items[sid])
+                if bbox and whiteboard.rect_hits_circle(*(v / self.scale for v in bbox), x, y, r):
+                    self._remove_item(sid)
+                    self.history.removed(sid)
+                continue
+            pieces = whiteboard.erase_polyline(rec.points, x, y, r + rec.width / 2)
+            if pieces is None:
+                continue
+            self._remove_item(sid)
+            self.history.removed(sid)
+            for piece in pieces:
+                new = self.store.add_stroke(piece, rec.color, rec.width)
+                self._draw_item(new)
+                self.history.added(new)
+
+    def _remove_item(self, sid):
+        item = self.items.pop(sid, None) or self.overlay.pop(sid, None)
+        if item is not None:
+            self.canvas.delete(item)
+        if self.store.kind[sid] == whiteboard.KIND_STROKE:
+            self.invalidate(self.store.stroke_points(sid), self.store.width[sid] / 2)
+        self.index.remove(sid)
+        self.store.remove(sid)
+
+    def clear_board(self):
+        # Undoable: every item is removed, not dropped
+        ids = self.store.ids()
+        for sid in ids:
+            self.history.removed(sid)
+        self._apply(ids, ())
+        self._commit()
+
+    # ---------- UNDO / REDO ----------
+    def _apply(self, remove, revive):
+        if len(remove) + len(revive) > BULK_UNDO:
+            for sid in remove:
+                self.store.remove(sid)
+            for sid in revive:
+                self.store.revive(sid)
+            self.redraw()
+            return
+        for sid in remove:
+            if self.store.is_alive(sid):
+                self._remove_item(sid)
+        for sid in revive:
+            self.store.revive(sid)
+            self._draw_item(sid)
+
+    def undo(self):
+        step = self.history.undo()
+        if step is not None:
+            self._apply(*step)
+            self._changed()
+
+    def redo(self):
+        step = self.history.redo()
+        if step is not None:
+            self._apply(*step)
+            self._changed()
+
+    def _commit(self):
+        if self.history.commit(self.store) is None:
+            return
+        self._changed()
+        if self.history.garbage(self.store) > self.history.budget:
+            # Reclaim data undo can no longer reach. With a file the ids
+            # must stay in step with it, so that means a full rewrite.
+            if self.path is not None:
+                self.write_board(self.path)
+            else:
+                self._remap(self.store.compact(self.history.referenced()))
+
+    # ---------- SAVE / LOAD ----------
+    def _changed(self):
+        if self.path is not None and self.autosave_job is None:
+            self.autosave_job = self.after(AUTOSAVE_MS, self.autosave)
+
+    def autosave(self):
+        # Appends only the records added since the last write
+        self.autosave_job = None
+        if self.path is not None:
+            self.store.append_journal(self.path)
+
+    def save_board(self):
+        if self.path is None:
+            from tkinter import filedialog
+            path = filedialog.asksaveasfilename(defaultextension=".wbd",
+                                                filetypes=WHITEBOARD_FILES)
+            if not path:
+                return
+            self.write_board(path)
+        elif self.store.dead_ratio() > 0.5:
+            # Mostly erased: rewrite compactly instead of growing the log
+            self.write_board(self.path)
+        else:
+            self.autosave()
+
+    def write_board(self, path):
+        self._remap(self.store.save(path, keep=self.history.referenced()))
+        self.path = path
+
+    def _remap(self, remap):
+        self.items = {remap[sid]: item for sid, item in self.items.items()}
+        self.overlay = {remap[sid]: item for sid, item in self.overlay.items()}
+        self.index.remap(remap)
+        self.history.remap(remap)
+
+    def open_board(self):
+        from tkinter import filedialog
+        path = filedialog.askopenfilename(filetypes=WHITEBOARD_FILES)
+        if path:
+            self.load_board(path)
+
+    def load_board(self, path):
+        try:
+            store = whiteboard.StrokeStore.load(path)
+        except (OSError, ValueError) as exc:
+            messagebox.showerror("Whiteboard", str(exc))
+            return
+        self.store = store
+        self.path = path
+        self.history.clear()
+        self.redraw()
+        if store.truncated:
+            self.write_board(path)
+
+
+# ================== Animation scheduler ==================
+
+class AnimationScheduler:
+    # One after() loop per toplevel drives every animated widget. Clients
+    # implement needs_frame() and animate(); only clients that are viewable
+    # (tab selected, window not minimized) and still need a frame are ticked.
+    # The delay is adapted to the measured frame period, and the loop stops
+    # completely when nothing is animating until wake() is called again.
+    def __init__(self, root, fps=30):
+        self.root = root
+        self.frame_time = 1.0 / fps
+        self.delay = self.frame_time
+        self.clients = []
+        self.job = None
+        self.last = None
+        # Any widget of this toplevel being mapped (tab switch, deiconify)
+        # may make a client visible again.
+        root.bind("<Map>", lambda event: self.wake(), add="+")
+
+    @classmethod
+    def for_widget(cls, widget):
+        top = widget.winfo_toplevel()
+        scheduler = getattr(top, "_animation_scheduler", None)
+        if scheduler is None:
+            scheduler = top._animation_scheduler = cls(top)
+        return scheduler
+
+    def register(self, client):
+        if client not in self.clients:
+            self.clients.append(client)
+        self.wake()
+
+    def wake(self):
+        if self.job is None:
+            self.last = None
+            self.job = self.root.after_idle(self._tick)
+
+    def _tick(self):
+        self.job = None
+        now = time.perf_counter()
+        if self.last is not None:
+            # Nudge the delay so the measured frame period converges on the target
+            error = self.frame_time - (now - self.last)
+            self.delay = min(self.frame_time, max(0.001, self.delay + 0.5 * error))
+        self.last = now
+
+        busy = False
+        for client in list(self.clients):
+            if not client.winfo_exists():
+                self.clients.remove(client)
+                continue
+            if client.winfo_viewable() and client.needs_frame():
+                client.animate()
+                busy = busy or client.needs_frame()
+
+        if busy:
+            self.job = self.root.after(int(self.delay * 1000) or 1, self._tick)
 
 
 # ================== Preview canvas (2D/3D per shape) ==================
 
-class ShapePreviewCanvas(tk.Canvas):
+class Canvas3D(tk.Canvas):
+    # Shared base for the rotating previews: canvas size is cached and kept
+    # current from <Configure> so drawing never round-trips through cget().
+    # Items are retained: a scene is built once and later frames only move
+    # the existing items with coords().
     def __init__(self, parent, width=400, height=400, bg="#050716", **kwargs):
         super().__init__(parent, width=width, height=height, bg=bg,
                          highlightthickness=1, highlightbackground="#24253a", **kwargs)
-        self.mode = "cube"  # default
+        self.view_w = int(width)
+        self.view_h = int(height)
         self.angle_x = 0.02
         self.angle_y = 0.03
         self.angle_z = 0.01
-
-        s = 1
-        self.cube_vertices = [
-            [-s, -s, -s],
-            [ s, -s, -s],
-            [ s,  s, -s],
-            [-s,  s, -s],
-            [-s, -s,  s],
-            [ s, -s,  s],
-            [ s,  s,  s],
-            [-s,  s,  s],
-        ]
-        self.cube_edges = [
-            (0, 1), (1, 2), (2, 3), (3, 0),
-            (4, 5), (5, 6), (6, 7), (7, 4),
-            (0, 4), (1, 5), (2, 6), (3, 7)
-        ]
-
-        self.after(30, self.animate)
+        self.scene = None  # what is currently drawn; None forces a rebuild
+        self.mesh_items = []
+        self.bind("<Configure>", self._on_configure, add="+")
+        self.scheduler = AnimationScheduler.for_widget(self)
+        self.scheduler.register(self)
+
+    def _on_configure(self, event):
+        if (event.width, event.height) != (self.view_w, self.view_h):
+            self.view_w, self.view_h = event.width, event.height
+            self.scene = None
+            self.scheduler.wake()
+
+    def needs_frame(self):
+        return self.scene is None
+
+    def reset_scene(self, scene=None):
+        self.delete("all")
+        self.mesh_items = []
+        self.scene = scene
+
+    def project_vertices(self, vertices):
+        # One rotation matrix per frame, applied to the whole mesh
+        m = render3d.rotation_matrix(self.angle_x, self.angle_y, self.angle_z)
+        return render3d.project(vertices, m, self.view_w, self.view_h)
+
+    def draw_mesh(self, vertices, edges, **line_opts):
+        projected = self.project_vertices(vertices)
+        if len(self.mesh_items) != len(edges):
+            for item in self.mesh_items:
+                self.delete(item)
+            self.mesh_items = [self.create_line(0, 0, 0, 0, **line_opts) for _ in edges]
+        for item, (i, j) in zip(self.mesh_items, edges):
+            x1, y1 = projected[i]
+            x2, y2 = projected[j]
+            self.coords(item, x1, y1, x2, y2)
+
+
+class ShapePreviewCanvas(Canvas3D):
+    def __init__(self, parent, width=400, height=400, bg="#050716", **kwargs):
+        super().__init__(parent, width=width, height=height, bg=bg, **kwargs)
+        self.mode = "cube"  # default
+        self.cube_vertices, self.cube_edges = render3d.cube_mesh()
 
     def set_shape(self, shape_key):
         # Map shape key to preview mode
@@ -128,46 +659,24 @@ class ShapePreviewCanvas(tk.Canvas):
             self.mode = "square"
         elif shape_key in ("ellipse",):
             self.mode = "ellipse"
-        elif shape_key in ("Rhombus",):
+        elif shape_key in ("rhombus", "Rhombus"):
             self.mode = "Rhombus"
 
         else:
             self.mode = "cube"  # default 3D-style preview
+        self.scheduler.wake()
 
-    def rotate(self, v, ax, ay, az):
-        x, y, z = v
-        cosx, sinx = math.cos(ax), math.sin(ax)
-        y, z = y * cosx - z * sinx, y * sinx + z * cosx
-        cosy, siny = math.cos(ay), math.sin(ay)
-        x, z = x * cosy + z * siny, -x * siny + z * cosy
-        cosz, sinz = math.cos(az), math.sin(az)
-        x, y = x * cosz - y * sinz, x * sinz + y * cosz
-        return [x, y, z]
-
-    def project(self, v):
-        w = int(self.cget("width"))
-        h = int(self.cget("height"))
-        fov = 200
-        dist = 4
-        x, y, z = v
-        factor = fov / (dist + z)
-        x = x * factor + w / 2
-        y = -y * factor + h / 2
-        return (x, y)
+    def needs_frame(self):
+        # 2D previews need a single frame after a change; the cube spins
+        return self.scene != self.mode or self.mode == "cube"
 
     def draw_cube(self):
-        rotated = [self.rotate(v, self.angle_x, self.angle_y, self.angle_z) for v in self.cube_vertices]
-        projected = [self.project(v) for v in rotated]
-        for e in self.cube_edges:
-            p1 = projected[e[0]]
-            p2 = projected[e[1]]
-            self.create_line(p1[0], p1[1], p2[0], p2[1], fill="#00ffcc", width=2)
+        self.draw_mesh(self.cube_vertices, self.cube_edges, fill="#00ffcc", width=2)
         self.create_text(10, 10, anchor="nw", text="3D Solid Preview", fill="#ffffff",
                          font=("Segoe UI", 10))
 
     def draw_circle(self):
-        w = int(self.cget("width"))
-        h = int(self.cget("height"))
+        w, h = self.view_w, self.view_h
         r = min(w, h) * 0.3
         cx, cy = w // 2, h // 2
         self.create_oval(cx - r, cy - r, cx + r, cy + r,
@@ -176,8 +685,7 @@ class ShapePreviewCanvas(tk.Canvas):
                          font=("Segoe UI", 10))
 
     def draw_square(self):
-        w = int(self.cget("width"))
-        h = int(self.cget("height"))
+        w, h = self.view_w, self.view_h
         s = min(w, h) * 0.5
         cx, cy = w // 2, h // 2
         self.create_rectangle(cx - s/2, cy - s/2, cx + s/2, cy + s/2,
@@ -186,8 +694,7 @@ class ShapePreviewCanvas(tk.Canvas):
                          font=("Segoe UI", 10))
 
     def draw_rectangle(self):
-        w = int(self.cget("width"))
-        h = int(self.cget("height"))
+        w, h = self.view_w, self.view_h
         rw = w * 0.6
         rh = h * 0.4
         cx, cy = w // 2, h // 2
@@ -197,8 +704,7 @@ class ShapePreviewCanvas(tk.Canvas):
                          font=("Segoe UI", 10))
 
     def draw_ellipse(self):
-        w = int(self.cget("width"))
-        h = int(self.cget("height"))
+        w, h = self.view_w, self.view_h
         rw = w * 0.6
         rh = h * 0.4
         cx, cy = w // 2, h // 2
@@ -208,9 +714,7 @@ class ShapePreviewCanvas(tk.Canvas):
                          font=("Segoe UI", 10))
     
     def draw_Rhombus(self):
-          w= int(self.cget("width"))
-          w = int(self.cget("width"))
-          h = int(self.cget("height"))
+          w, h = self.view_w, self.view_h
           rw = w * 0.6 
           rh = h * 0.4
           cx, cy = w // 2, h // 2
@@ -237,85 +741,42 @@ class ShapePreviewCanvas(tk.Canvas):
 
         
     def animate(self):
-        self.delete("all")
-        if self.mode == "circle":
-            self.draw_circle()
-        elif self.mode == "square":
-            self.draw_square()
-        elif self.mode == "rectangle":
-            self.draw_rectangle()
-        elif self.mode == "ellipse":
-            self.draw_ellipse()
-        elif self.mode=="Rhombus":
-            self.draw_Rhombus()
-        else:
-            self.draw_cube()
+        if self.scene != self.mode:
+            # Shape changed (or canvas resized): rebuild the items once
+            self.reset_scene(self.mode)
+            if self.mode == "circle":
+                self.draw_circle()
+            elif self.mode == "square":
+                self.draw_square()
+            elif self.mode == "rectangle":
+                self.draw_rectangle()
+            elif self.mode == "ellipse":
+                self.draw_ellipse()
+            elif self.mode=="Rhombus":
+                self.draw_Rhombus()
+            else:
+                self.draw_cube()
+        elif self.mode == "cube":
+            # 2D previews are static; only the cube's items move
+            self.draw_mesh(self.cube_vertices, self.cube_edges)
         # rotate slightly only in cube mode
         if self.mode == "cube":
             self.angle_x += 0.01
             self.angle_y += 0.015
             self.angle_z += 0.008
-        self.after(30, self.animate)
 
 
-class RotatingCubeCanvas(tk.Canvas):
+class RotatingCubeCanvas(Canvas3D):
     def __init__(self, parent, width=400, height=400, bg="#050716", **kwargs):
-        super().__init__(parent, width=width, height=height, bg=bg,
-                         highlightthickness=1, highlightbackground="#24253a", **kwargs)
-        s = 1
-        self.vertices = [
-            [-s, -s, -s],
-            [ s, -s, -s],
-            [ s,  s, -s],
-            [-s,  s, -s],
-            [-s, -s,  s],
-            [ s, -s,  s],
-            [ s,  s,  s],
-            [-s,  s,  s],
-        ]
-        self.edges = [
-            (0, 1), (1, 2), (2, 3), (3, 0),
-            (4, 5), (5, 6), (6, 7), (7, 4),
-            (0, 4), (1, 5), (2, 6), (3, 7)
-        ]
-        self.angle_x = 0.02
-        self.angle_y = 0.03
-        self.angle_z = 0.01
-        self.after(30, self.animate)
-
-    def rotate(self, v, ax, ay, az):
-        x, y, z = v
-        cosx, sinx = math.cos(ax), math.sin(ax)
-        y, z = y * cosx - z * sinx, y * sinx + z * cosx
-        cosy, siny = math.cos(ay), math.sin(ay)
-        x, z = x * cosy + z * siny, -x * siny + z * cosy
-        cosz, sinz = math.cos(az), math.sin(az)
-        x, y = x * cosz - y * sinz, x * sinz + y * cosz
-        return [x, y, z]
-
-    def project(self, v):
-        w = int(self.cget("width"))
-        h = int(self.cget("height"))
-        fov = 200
-        dist = 4
-        x, y, z = v
-        factor = fov / (dist + z)
-        x = x * factor + w / 2
-        y = -y * factor + h / 2
-        return (x, y)
+        super().__init__(parent, width=width, height=height, bg=bg, **kwargs)
+        self.vertices, self.edges = render3d.cube_mesh()
 
     def animate(self):
-        rotated = [self.rotate(v, self.angle_x, self.angle_y, self.angle_z) for v in self.vertices]
-        projected = [self.project(v) for v in rotated]
-
-        self.delete("all")
-        for e in self.edges:
-            p1 = projected[e[0]]
-            p2 = projected[e[1]]
-            self.create_line(p1[0], p1[1], p2[0], p2[1], fill="#00ffcc", width=2)
-        self.create_text(10, 10, anchor="nw", text="3D Preview", fill="#ffffff",
-                         font=("Segoe UI", 10))
-        self.after(30, self.animate)
+        if self.scene is None:
+            self.reset_scene("cube")
+            self.create_text(10, 10, anchor="nw", text="3D Preview", fill="#ffffff",
+                             font=("Segoe UI", 10))
+        self.draw_mesh(self.vertices, self.edges, fill="#00ffcc", width=2)
 
 
 # ================== Shape Frames ==================
@@ -345,13 +806,14 @@ class CircleFrame(ttk.Frame):
             r = float_input(self.radius_entry, "radius")
         except ValueError:
             return
+        res = geometry.circle(r)
         lines = []
         if self.var_area.get():
-            lines.append(f"Area = πr² = {math.pi * r ** 2:.4f}")
+            lines.append(f"Area = πr² = {res.area:.4f}")
         if self.var_circ.get():
-            lines.append(f"Circumference = 2πr = {2 * math.pi * r:.4f}")
+            lines.append(f"Circumference = 2πr = {res.circumference:.4f}")
         if self.var_diam.get():
-            lines.append(f"Diameter = 2r = {2 * r:.4f}")
+            lines.append(f"Diameter = 2r = {res.diameter:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -387,11 +849,12 @@ class RectangleFrame(ttk.Frame):
             b = float_input(self.breadth_entry, "breadth")
         except ValueError:
             return
+        res = geometry.rectangle(l, b)
         lines = []
         if self.var_area.get():
-            lines.append(f"Area = l × b = {l * b:.4f}")
+            lines.append(f"Area = l × b = {res.area:.4f}")
         if self.var_per.get():
-            lines.append(f"Perimeter = 2(l + b) = {2 * (l + b):.4f}")
+            lines.append(f"Perimeter = 2(l + b) = {res.perimeter:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -423,11 +886,12 @@ class SquareFrame(ttk.Frame):
             a = float_input(self.side_entry, "side")
         except ValueError:
             return
+        res = geometry.square(a)
         lines = []
         if self.var_area.get():
-            lines.append(f"Area = a² = {a * a:.4f}")
+            lines.append(f"Area = a² = {res.area:.4f}")
         if self.var_per.get():
-            lines.append(f"Perimeter = 4a = {4 * a:.4f}")
+            lines.append(f"Perimeter = 4a = {res.perimeter:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -461,17 +925,22 @@ class RhombusFrame(ttk.Frame):
         self.output.grid(row=6, column=0, columnspan=2, pady=5, padx=5)
 
     def calculate(self):
-        lines = []
+        # Only the entries needed by the selected options are read
+        d1 = d2 = a = math.nan
         try:
             if self.var_area.get():
                 d1 = float_input(self.d1_entry, "diagonal 1")
                 d2 = float_input(self.d2_entry, "diagonal 2")
-                lines.append(f"Area = 1/2 d1 d2 = {0.5 * d1 * d2:.4f}")
             if self.var_per.get():
                 a = float_input(self.side_entry, "side")
-                lines.append(f"Perimeter = 4a = {4 * a:.4f}")
         except ValueError:
             return
+        res = geometry.rhombus(d1, d2, a)
+        lines = []
+        if self.var_area.get():
+            lines.append(f"Area = 1/2 d1 d2 = {res.area:.4f}")
+        if self.var_per.get():
+            lines.append(f"Perimeter = 4a = {res.perimeter:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -482,24 +951,8 @@ class RhombusFrame(ttk.Frame):
 
 
 class TriangleFrame(ttk.Frame):
-    def float_input(entry, name):
-     value = entry.get().strip()
-
-     if not value:
-            raise ValueError(f"{name} is empty")
-     return float(value)
- 
-class TriangleFrame(ttk.Frame):
-    import tkinter as tk
-from tkinter import ttk
-import math
-
-
-def float_input(entry):
-    return float(entry.get().strip())
-
-
-class TriangleFrame(ttk.Frame):
+    # Area from base·height and from Heron's formula, perimeter, and an
+    # animated extrusion preview of the base/height triangle.
     def __init__(self, parent):
         super().__init__(parent)
 
@@ -550,11 +1003,12 @@ class TriangleFrame(ttk.Frame):
         # animation
         self.angle = 0
         self.running = False
+        self.tri_items = None  # retained canvas items for the extrusion
+        self.scheduler = AnimationScheduler.for_widget(self)
+        self.scheduler.register(self)
 
     # ---------- DRAW 3D TRIANGLE ----------
     def draw_triangle_3d(self, base, height):
-        self.canvas.delete("all")
-
         scale = 100 / max(base, height)
         b = base * scale
         h = height * scale
@@ -574,73 +1028,70 @@ class TriangleFrame(ttk.Frame):
         x2b, y2b = x2 + dx, y2 + dy
         x3b, y3b = x3 + dx, y3 + dy
 
-        self.canvas.create_polygon(x1, y1, x2, y2, x3, y3,
-                                   outline="blue", width=2)
-        self.canvas.create_polygon(x1b, y1b, x2b, y2b, x3b, y3b,
-                                   outline="gray", dash=(4, 2))
-
-        self.canvas.create_line(x1, y1, x1b, y1b)
-        self.canvas.create_line(x2, y2, x2b, y2b)
-        self.canvas.create_line(x3, y3, x3b, y3b)
+        if self.tri_items is None:
+            c = self.canvas
+            self.tri_items = (
+                c.create_polygon(0, 0, 0, 0, 0, 0, outline="blue", width=2),
+                c.create_polygon(0, 0, 0, 0, 0, 0, outline="gray", dash=(4, 2)),
+                c.create_line(0, 0, 0, 0),
+                c.create_line(0, 0, 0, 0),
+                c.create_line(0, 0, 0, 0),
+            )
+        front, back, e1, e2, e3 = self.tri_items
+        self.canvas.coords(front, x1, y1, x2, y2, x3, y3)
+        self.canvas.coords(back, x1b, y1b, x2b, y2b, x3b, y3b)
+        self.canvas.coords(e1, x1, y1, x1b, y1b)
+        self.canvas.coords(e2, x2, y2, x2b, y2b)
+        self.canvas.coords(e3, x3, y3, x3b, y3b)
 
     # ---------- CALCULATE ----------
     def calculate_and_start(self):
         try:
-            base = float_input(self.base_entry)
-            height = float_input(self.height_entry)
-            a = float_input(self.a_entry)
-            b = float_input(self.b_entry)
-            c = float_input(self.c_entry)
+            base = float_input(self.base_entry, "base")
+            height = float_input(self.height_entry, "height")
+            a = float_input(self.a_entry, "side a")
+            b = float_input(self.b_entry, "side b")
+            c = float_input(self.c_entry, "side c")
         except ValueError:
             return
 
-        # calculations
-        area = 0.5 * base * height
-        perimeter = a + b + c
-
-        # Heron's formula
-        s = perimeter / 2
-        val = s * (s-a) * (s-b) * (s-c)
-        area_heron = math.sqrt(val) if val > 0 else 0
+        res = geometry.triangle(base, height, a, b, c)
 
         # output
         self.output.config(state="normal")
         self.output.delete("1.0", "end")
         self.output.insert(
             "end",
-            f"Area (½·b·h) = {area:.4f}\n"
-            f"Perimeter = {perimeter:.4f}\n"
-            f"Area (Heron) = {area_heron:.4f}"
+            f"Area (½·b·h) = {res.area:.4f}\n"
+            f"Perimeter = {res.perimeter:.4f}\n"
+            f"Area (Heron) = {res.area_heron:.4f}"
         )
         self.output.config(state="disabled")
 
-        # start animation
+        # start animation (driven by the shared scheduler)
         self.running = True
-        self.animate()
+        self.scheduler.wake()
+
+    # ---------- ANIMATION FRAME ----------
+    def needs_frame(self):
+        return self.running
 
-    # ---------- ANIMATION LOOP ----------
     def animate(self):
-        if not self.running:
+        # Read silently: a popup per frame would be unusable. Editing the
+        # entries to something invalid just stops the animation.
+        try:
+            base = float(self.base_entry.get())
+            height = float(self.height_entry.get())
+        except ValueError:
+            self.running = False
+            return
+        if max(base, height) <= 0 or not (math.isfinite(base) and math.isfinite(height)):
+            self.running = False
             return
-
-        base = float_input(self.base_entry)
-        height = float_input(self.height_entry)
 
         self.draw_triangle_3d(base, height)
         self.angle += 0.05
 
-        self.after(50, self.animate)
-
-
-# ---------- MAIN ----------
-root = tk.Tk()
-root.title("3D Triangle Calculator")
-
-TriangleFrame(root).pack(padx=10, pady=10)
-
-root.mainloop()
-
-
 
 class PentagonFrame(ttk.Frame):
     def __init__(self, parent):
@@ -669,12 +1120,11 @@ class PentagonFrame(ttk.Frame):
             apo = float_input(self.apo_entry, "apothem")
         except ValueError:
             return
+        res = geometry.pentagon(side, apo)
         if self.var_area.get():
-            area = 0.5 * (5 * side) * apo
-            lines.append(f"Area = 1/2 · P · apothem = {area:.4f}")
+            lines.append(f"Area = 1/2 · P · apothem = {res.area:.4f}")
         if self.var_per.get():
-            per = 5 * side
-            lines.append(f"Perimeter = 5a = {per:.4f}")
+            lines.append(f"Perimeter = 5a = {res.perimeter:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -706,11 +1156,12 @@ class CubeFrame(ttk.Frame):
             a = float_input(self.a_entry, "side")
         except ValueError:
             return
+        res = geometry.cube(a)
         lines = []
         if self.var_tsa.get():
-            lines.append(f"TSA = 6a² = {6 * a * a:.4f}")
+            lines.append(f"TSA = 6a² = {res.tsa:.4f}")
         if self.var_vol.get():
-            lines.append(f"Volume = a³ = {a ** 3:.4f}")
+            lines.append(f"Volume = a³ = {res.volume:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -750,12 +1201,12 @@ class CuboidFrame(ttk.Frame):
             h = float_input(self.h_entry, "height")
         except ValueError:
             return
+        res = geometry.cuboid(l, b, h)
         lines = []
         if self.var_tsa.get():
-            tsa = 2 * (l * b + b * h + h * l)
-            lines.append(f"TSA = 2(lb + bh + hl) = {tsa:.4f}")
+            lines.append(f"TSA = 2(lb + bh + hl) = {res.tsa:.4f}")
         if self.var_vol.get():
-            lines.append(f"Volume = lbh = {l * b * h:.4f}")
+            lines.append(f"Volume = lbh = {res.volume:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -791,12 +1242,12 @@ class CylinderFrame(ttk.Frame):
             h = float_input(self.h_entry, "height")
         except ValueError:
             return
+        res = geometry.cylinder(r, h)
         lines = []
         if self.var_tsa.get():
-            tsa = 2 * math.pi * r * (r + h)
-            lines.append(f"TSA = 2πr(r + h) = {tsa:.4f}")
+            lines.append(f"TSA = 2πr(r + h) = {res.tsa:.4f}")
         if self.var_vol.get():
-            lines.append(f"Volume = πr²h = {math.pi * r * r * h:.4f}")
+            lines.append(f"Volume = πr²h = {res.volume:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -828,11 +1279,12 @@ class SphereFrame(ttk.Frame):
             r = float_input(self.r_entry, "radius")
         except ValueError:
             return
+        res = geometry.sphere(r)
         lines = []
         if self.var_sa.get():
-            lines.append(f"Surface area = 4πr² = {4 * math.pi * r * r:.4f}")
+            lines.append(f"Surface area = 4πr² = {res.tsa:.4f}")
         if self.var_vol.get():
-            lines.append(f"Volume = 4/3 πr³ = {(4 / 3) * math.pi * r ** 3:.4f}")
+            lines.append(f"Volume = 4/3 πr³ = {res.volume:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -868,13 +1320,12 @@ class ConeFrame(ttk.Frame):
             h = float_input(self.h_entry, "height")
         except ValueError:
             return
+        res = geometry.cone(r, h)
         lines = []
-        l = math.sqrt(r * r + h * h)
         if self.var_tsa.get():
-            tsa = math.pi * r * (r + l)
-            lines.append(f"TSA = πr(r + l) (l={l:.4f}) = {tsa:.4f}")
+            lines.append(f"TSA = πr(r + l) (l={res.slant_height:.4f}) = {res.tsa:.4f}")
         if self.var_vol.get():
-            lines.append(f"Volume = 1/3 πr²h = {(math.pi * r * r * h / 3):.4f}")
+            lines.append(f"Volume = 1/3 πr²h = {res.volume:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -906,11 +1357,12 @@ class HemisphereFrame(ttk.Frame):
             r = float_input(self.r_entry, "radius")
         except ValueError:
             return
+        res = geometry.hemisphere(r)
         lines = []
         if self.var_tsa.get():
-            lines.append(f"TSA = 3πr² = {3 * math.pi * r * r:.4f}")
+            lines.append(f"TSA = 3πr² = {res.tsa:.4f}")
         if self.var_vol.get():
-            lines.append(f"Volume = 2/3 πr³ = {(2 / 3) * math.pi * r ** 3:.4f}")
+            lines.append(f"Volume = 2/3 πr³ = {res.volume:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -959,14 +1411,11 @@ class PrismFrame(ttk.Frame):
             a3 = float_input(self.c_entry, "side c")
         except ValueError:
             return
-        base_area = 0.5 * b * h_base
-        volume = base_area * h_prism
-        per_base = a1 + a2 + a3
-        tsa = 2 * base_area + per_base * h_prism
+        res = geometry.prism(b, h_base, h_prism, a1, a2, a3)
         lines = [
-            f"Base area = 1/2·b·h = {base_area:.4f}",
-            f"Volume = base_area·H = {volume:.4f}",
-            f"TSA = 2·base_area + P_base·H = {tsa:.4f}",
+            f"Base area = 1/2·b·h = {res.base_area:.4f}",
+            f"Volume = base_area·H = {res.volume:.4f}",
+            f"TSA = 2·base_area + P_base·H = {res.tsa:.4f}",
         ]
         self._show(lines)
 
@@ -1002,14 +1451,11 @@ class PyramidFrame(ttk.Frame):
             l = float_input(self.l_entry, "slant height")
         except ValueError:
             return
-        base_area = a * a
-        volume = (1 / 3) * base_area * h
-        per_base = 4 * a
-        tsa = base_area + 0.5 * per_base * l
+        res = geometry.pyramid(a, h, l)
         lines = [
-            f"Base area = a² = {base_area:.4f}",
-            f"Volume = 1/3·base_area·h = {volume:.4f}",
-            f"TSA = base_area + 1/2·P_base·l = {tsa:.4f}",
+            f"Base area = a² = {res.base_area:.4f}",
+            f"Volume = 1/3·base_area·h = {res.volume:.4f}",
+            f"TSA = base_area + 1/2·P_base·l = {res.tsa:.4f}",
         ]
         self._show(lines)
 
@@ -1054,11 +1500,10 @@ class TrapeziumFrame(ttk.Frame):
             d = float_input(self.d_entry, "side d")
         except ValueError:
             return
-        area = 0.5 * (a + b) * h
-        per = a + b + c + d
+        res = geometry.trapezium(a, b, h, c, d)
         lines = [
-            f"Area = 1/2(a + b)h = {area:.4f}",
-            f"Perimeter = a + b + c + d = {per:.4f}",
+            f"Area = 1/2(a + b)h = {res.area:.4f}",
+            f"Perimeter = a + b + c + d = {res.perimeter:.4f}",
         ]
         self._show(lines)
 
@@ -1099,11 +1544,10 @@ class ParallelogramFrame(ttk.Frame):
             s2 = float_input(self.s2_entry, "side2")
         except ValueError:
             return
-        area = base * height
-        per = 2 * (s1 + s2)
+        res = geometry.parallelogram(base, height, s1, s2)
         lines = [
-            f"Area = base·height = {area:.4f}",
-            f"Perimeter = 2(side1 + side2) = {per:.4f}",
+            f"Area = base·height = {res.area:.4f}",
+            f"Perimeter = 2(side1 + side2) = {res.perimeter:.4f}",
         ]
         self._show(lines)
 
@@ -1140,12 +1584,12 @@ class EllipseFrame(ttk.Frame):
             b = float_input(self.b_entry, "b")
         except ValueError:
             return
+        res = geometry.ellipse(a, b)
         lines = []
         if self.var_area.get():
-            lines.append(f"Area = πab = {math.pi * a * b:.4f}")
+            lines.append(f"Area = πab = {res.area:.4f}")
         if self.var_per.get():
-            peri = 2 * math.pi * math.sqrt((a * a + b * b) / 2)
-            lines.append(f"Approx perimeter ≈ 2π√((a²+b²)/2) = {peri:.4f}")
+            lines.append(f"Approx perimeter ≈ 2π√((a²+b²)/2) = {res.perimeter:.4f}")
         self._show(lines)
 
     def _show(self, lines):
@@ -1176,13 +1620,11 @@ class SectorFrame(ttk.Frame):
             theta = float_input(self.theta_entry, "angle")
         except ValueError:
             return
-        area = (theta / 360) * math.pi * r * r
-        arc = (theta / 360) * 2 * math.pi * r
-        perim = 2 * r + arc
+        res = geometry.sector(r, theta)
         lines = [
-            f"Area = (θ/360)·πr² = {area:.4f}",
-            f"Arc length = (θ/360)·2πr = {arc:.4f}",
-            f"Perimeter of sector = 2r + arc = {perim:.4f}",
+            f"Area = (θ/360)·πr² = {res.area:.4f}",
+            f"Arc length = (θ/360)·2πr = {res.arc_length:.4f}",
+            f"Perimeter of sector = 2r + arc = {res.perimeter:.4f}",
         ]
         self._show(lines)
 
@@ -1210,10 +1652,11 @@ class ParabolaFrame(ttk.Frame):
             a = float_input(self.a_entry, "a")
         except ValueError:
             return
+        res = geometry.parabola(a)
         lines = [
-            f"Focus (horizontal): (a, 0) = ({a:.4f}, 0)",
-            f"Directrix (horizontal): x = {-a:.4f}",
-            f"Latus rectum length = 4a = {4 * a:.4f}",
+            f"Focus (horizontal): (a, 0) = ({res.focus_x:.4f}, 0)",
+            f"Directrix (horizontal): x = {res.directrix_x:.4f}",
+            f"Latus rectum length = 4a = {res.latus_rectum:.4f}",
         ]
         self._show(lines)
 
@@ -1223,11 +1666,101 @@ class ParabolaFrame(ttk.Frame):
         self.output.insert("end", "\n".join(lines))
         self.output.config(state="disabled")
 
+# ================== Navigation ==================
+
+# Menu layout: (section title, [(button label, shape key, frame class), ...])
+SHAPE_MENU = [
+    ("Shapes", [
+        ("Circle", "circle", CircleFrame),
+        ("Rectangle", "rectangle", RectangleFrame),
+        ("Square", "square", SquareFrame),
+        ("Rhombus", "rhombus", RhombusFrame),
+        ("Triangle", "triangle", TriangleFrame),
+        ("Pentagon", "pentagon", PentagonFrame),
+        ("Parallelogram", "parallelogram", ParallelogramFrame),
+        ("Trapezium", "trapezium", TrapeziumFrame),
+        ("Ellipse", "ellipse", EllipseFrame),
+        ("Sector", "sector", SectorFrame),
+        ("Parabola", "parabola", ParabolaFrame),
+    ]),
+    ("3D Solids", [
+        ("Cube", "cube", CubeFrame),
+        ("Cuboid", "cuboid", CuboidFrame),
+        ("Cylinder", "cylinder", CylinderFrame),
+        ("Sphere", "sphere", SphereFrame),
+        ("Cone", "cone", ConeFrame),
+        ("Hemisphere", "hemisphere", HemisphereFrame),
+        ("Prism", "prism", PrismFrame),
+        ("Pyramid", "pyramid", PyramidFrame),
+    ]),
+]
+
+SHAPE_FRAMES = {key: cls for _, items in SHAPE_MENU for _, key, cls in items}
+
+
+class ShapeNavigator:
+    # Builds each shape frame on first use and keeps the most recently used
+    # ones alive (pack_forget / pack), so switching back to a shape is a
+    # single geometry-manager call and keeps whatever was typed into it.
+    def __init__(self, container, frames=SHAPE_FRAMES, cache_size=8):
+        self.container = container
+        self.frames = frames
+        self.cache_size = max(1, cache_size)
+        self.cache = OrderedDict()  # shape key -> frame, least recent first
+        self.current = None
+
+    def show(self, key):
+        if key == self.current:
+            return self.cache[key]
+        frame = self.cache.get(key)
+        if frame is None:
+            frame = self.cache[key] = self.frames[key](self.container)
+        self.cache.move_to_end(key)
+
+        if self.current is not None:
+            self.cache[self.current].pack_forget()
+        frame.pack(fill="both", expand=True)
+        self.current = key
+
+        while len(self.cache) > self.cache_size:
+            _, old = self.cache.popitem(last=False)
+            old.destroy()
+        return frame
+
+
+# ================== Startup profiling ==================
+
+class StartupProfiler:
+    # Records how long each startup phase took, up to the first idle
+    # callback after construction (i.e. the first painted frame).
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.start = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+    def total(self):
+        return (self.last - self.start) * 1000
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        for phase, ms in self.phases:
+            print(f"  {phase:<20} {ms:8.1f} ms", file=file)
+        print(f"  {'time to first frame':<20} {self.total():8.1f} ms", file=file)
+
+
 # ================== Main App ==================
 
 class GeometryApp(tk.Tk):
-    def __init__(self):
+    def __init__(self, frame_cache_size=8, profile_startup=False):
+        self.profiler = StartupProfiler(profile_startup)
         super().__init__()
+        self.profiler.mark("tk init")
+        self.frame_cache_size = frame_cache_size
         self.title("Geometry Calculator - Dark Star Pro")
         self.geometry("1200x700")
         self.configure(bg="#02030a")
@@ -1238,13 +1771,32 @@ class GeometryApp(tk.Tk):
         self.style.configure("TLabel", background="#02030a", foreground="#f0f0f0")
         self.style.configure("TButton", background="#141627", foreground="#f0f0f0")
         self.style.map("TButton", background=[("active", "#1e2140")])
+        self.profiler.mark("style")
 
         self.create_star_background()
+        self.profiler.mark("background")
         self.create_layout()
+        self.after_idle(self._on_first_frame)
+
+    def _on_first_frame(self):
+        self.profiler.mark("first frame")
+        if self.profiler.enabled:
+            self.profiler.report()
+        # Non-essential work runs once the window is up
+        self.after(1, self.draw_stars)
 
     def create_star_background(self):
-        bg_canvas = tk.Canvas(self, bg="#02030a", highlightthickness=0)
-        bg_canvas.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.bg_canvas = tk.Canvas(self, bg="#02030a", highlightthickness=0)
+        self.bg_canvas.place(relx=0, rely=0, relwidth=1, relheight=1)
+        self.stars_drawn = False
+
+        self.overlay = tk.Frame(self, bg="#02030a")
+        self.overlay.place(relx=0, rely=0, relwidth=1, relheight=1)
+
+    def draw_stars(self):
+        if self.stars_drawn:
+            return
+        self.stars_drawn = True
 
         import random
         for _ in range(140):
@@ -1252,10 +1804,7 @@ class GeometryApp(tk.Tk):
             y = random.randint(0, 700)
             r = random.choice([1, 1, 2])
             color = random.choice(["#ffffff", "#a0c4ff", "#c4f1ff"])
-            bg_canvas.create_oval(x - r, y - r, x + r, y + r, fill=color, outline="")
-
-        self.overlay = tk.Frame(self, bg="#02030a")
-        self.overlay.place(relx=0, rely=0, relwidth=1, relheight=1)
+            self.bg_canvas.create_oval(x - r, y - r, x + r, y + r, fill=color, outline="")
 
     def create_layout(self):
         header = tk.Label(
@@ -1275,6 +1824,7 @@ class GeometryApp(tk.Tk):
             bg="#cdcdd0",
         )
         subtitle.pack(pady=2)
+        self.profiler.mark("header")
 
         main_frame = ttk.Frame(self.overlay)
         main_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -1282,8 +1832,6 @@ class GeometryApp(tk.Tk):
         menu_frame = ttk.Frame(main_frame)
         menu_frame.pack(side="left", fill="y", padx=(0, 10))
 
-        ttk.Label(menu_frame, text="Shapes", font=("Segoe UI", 12, "bold")).pack(pady=5)
-
         right_frame = ttk.Frame(main_frame)
         right_frame.pack(side="left", fill="both", expand=True)
 
@@ -1299,145 +1847,47 @@ class GeometryApp(tk.Tk):
         self.preview_canvas = ShapePreviewCanvas(self.calc_tab)
         self.preview_canvas.pack(side="left", fill="both", expand=True, padx=10, pady=10)
 
-        self.whiteboard_tab = WhiteboardFrame(self.tabs)
+        # The whiteboard itself is built the first time its tab is selected
+        self.whiteboard_tab = ttk.Frame(self.tabs)
         self.tabs.add(self.whiteboard_tab, text="Whiteboard")
+        self.whiteboard = None
+        self.tabs.bind("<<NotebookTabChanged>>", self._on_tab_changed, add="+")
+        self.profiler.mark("notebook")
+
+        self.navigator = ShapeNavigator(self.calc_left, cache_size=self.frame_cache_size)
 
-        self.current_shape_frame = None
-
-        def add_btn(name, key, cmd):
-            btn = ttk.Button(menu_frame, text=name,
-                             command=lambda: (self.preview_canvas.set_shape(key), cmd()))
-            btn.pack(fill="x", pady=2)
-
-        # 2D shapes
-        add_btn("Circle", "circle", self.show_circle)
-        add_btn("Rectangle", "rectangle", self.show_rectangle)
-        add_btn("Square", "square", self.show_square)
-        add_btn("Rhombus", "rhombus", self.show_rhombus)
-        add_btn("Triangle", "triangle", self.show_triangle)
-        add_btn("Pentagon", "pentagon", self.show_pentagon)
-        add_btn("Parallelogram", "parallelogram", self.show_parallelogram)
-        add_btn("Trapezium", "trapezium", self.show_trapezium)
-        add_btn("Ellipse", "ellipse", self.show_ellipse)
-        add_btn("Sector", "sector", self.show_sector)
-        add_btn("Parabola", "parabola", self.show_parabola)
-
-        ttk.Label(menu_frame, text="3D Solids", font=("Segoe UI", 12, "bold")).pack(pady=(10, 4))
-        add_btn("Cube", "cube", self.show_cube)
-        add_btn("Cuboid", "cuboid", self.show_cuboid)
-        add_btn("Cylinder", "cylinder", self.show_cylinder)
-        add_btn("Sphere", "sphere", self.show_sphere)
-        add_btn("Cone", "cone", self.show_cone)
-        add_btn("Hemisphere", "hemisphere", self.show_hemisphere)
-        add_btn("Prism", "prism", self.show_prism)
-        add_btn("Pyramid", "pyramid", self.show_pyramid)
+        for i, (section, items) in enumerate(SHAPE_MENU):
+            ttk.Label(menu_frame, text=section, font=("Segoe UI", 12, "bold")).pack(
+                pady=5 if i == 0 else (10, 4))
+            for label, key, _ in items:
+                btn = ttk.Button(menu_frame, text=label,
+                                 command=lambda key=key: self.show_shape(key))
+                btn.pack(fill="x", pady=2)
+        self.profiler.mark("menu")
 
         # Default
-        self.preview_canvas.set_shape("circle")
-        self.show_circle()
-
-    def clear_current_shape_frame(self):
-        if self.current_shape_frame is not None:
-            self.current_shape_frame.destroy()
-            self.current_shape_frame = None
-
-    # Show methods (same as before; just call frames)
-    def show_circle(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = CircleFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both", expand=True)
-
-    def show_rectangle(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = RectangleFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both", expand=True)
-
-    def show_square(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = SquareFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both", expand=True)
-
-    def show_rhombus(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = RhombusFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both", expand=True)
-
-    def show_triangle(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = TriangleFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both", expand=True)
-
-    def show_pentagon(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = PentagonFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both", expand=True)
-
-    def show_cube(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = CubeFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_cuboid(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = CuboidFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_cylinder(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = CylinderFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_sphere(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = SphereFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_cone(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = ConeFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_hemisphere(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = HemisphereFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_prism(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = PrismFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_pyramid(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = PyramidFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_trapezium(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = TrapeziumFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_parallelogram(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = ParallelogramFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_ellipse(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = EllipseFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_sector(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = SectorFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
-
-    def show_parabola(self):
-        self.clear_current_shape_frame()
-        self.current_shape_frame = ParabolaFrame(self.calc_left)
-        self.current_shape_frame.pack(fill="both",expand=True)
+        self.show_shape("circle")
+        self.profiler.mark("default shape")
+
+    def _on_tab_changed(self, event):
+        if self.whiteboard is None and self.tabs.select() == str(self.whiteboard_tab):
+            self.whiteboard = WhiteboardFrame(self.whiteboard_tab)
+            self.whiteboard.pack(fill="both", expand=True)
+
+    @property
+    def current_shape_frame(self):
+        key = self.navigator.current
+        return None if key is None else self.navigator.cache[key]
+
+    def show_shape(self, key):
+        self.preview_canvas.set_shape(key)
+        return self.navigator.show(key)
 
 
 if __name__ == "__main__":
-    app = GeometryApp()
-    app.mainloop()
+    if sys.argv[1:2] == ["batch"]:
+        import batch
+        batch.main(sys.argv[2:])
+    else:
+        app = GeometryApp(profile_startup="--profile-startup" in sys.argv[1:])
+        app.mainloop()
@@ -0,0 +1,147 @@
+import math
+from collections import namedtuple
+
+
+# ================== Result types ==================
+
+AreaPerimeter = namedtuple("AreaPerimeter", "area perimeter")
+SurfaceVolume = namedtuple("SurfaceVolume", "tsa volume")
+CircleResult = namedtuple("CircleResult", "area circumference diameter")
+TriangleResult = namedtuple("TriangleResult", "area perimeter area_heron")
+ConeResult = namedtuple("ConeResult", "slant_height tsa volume")
+SolidBaseResult = namedtuple("SolidBaseResult", "base_area volume tsa")
+SectorResult = namedtuple("SectorResult", "area arc_length perimeter")
+ParabolaResult = namedtuple("ParabolaResult", "focus_x directrix_x latus_rectum")
+
+
+# ================== 2D shapes ==================
+
+def circle(radius):
+    return CircleResult(math.pi * radius ** 2, 2 * math.pi * radius, 2 * radius)
+
+
+def rectangle(length, breadth):
+    return AreaPerimeter(length * breadth, 2 * (length + breadth))
+
+
+def square(side):
+    return AreaPerimeter(side * side, 4 * side)
+
+
+def rhombus(d1, d2, side):
+    return AreaPerimeter(0.5 * d1 * d2, 4 * side)
+
+
+def triangle(base, height, a, b, c):
+    perimeter = a + b + c
+    # Heron's formula
+    s = perimeter / 2
+    val = s * (s - a) * (s - b) * (s - c)
+    area_heron = math.sqrt(val) if val > 0 else 0
+    return TriangleResult(0.5 * base * height, perimeter, area_heron)
+
+
+def pentagon(side, apothem):
+    perimeter = 5 * side
+    return AreaPerimeter(0.5 * perimeter * apothem, perimeter)
+
+
+def trapezium(a, b, height, c, d):
+    return AreaPerimeter(0.5 * (a + b) * height, a + b + c + d)
+
+
+def parallelogram(base, height, side1, side2):
+    return AreaPerimeter(base * height, 2 * (side1 + side2))
+
+
+def ellipse(a, b):
+    # Perimeter is the RMS approximation 2π√((a²+b²)/2)
+    return AreaPerimeter(math.pi * a * b,
+                         2 * math.pi * ((a * a + b * b) / 2) ** 0.5)
+
+
+def sector(radius, angle):
+    area = (angle / 360) * math.pi * radius * radius
+    arc = (angle / 360) * 2 * math.pi * radius
+    return SectorResult(area, arc, 2 * radius + arc)
+
+
+def parabola(a):
+    return ParabolaResult(a, -a, 4 * a)
+
+
+# ================== 3D solids ==================
+
+def cube(side):
+    return SurfaceVolume(6 * side * side, side ** 3)
+
+
+def cuboid(length, breadth, height):
+    tsa = 2 * (length * breadth + breadth * height + height * length)
+    return SurfaceVolume(tsa, length * breadth * height)
+
+
+def cylinder(radius, height):
+    return SurfaceVolume(2 * math.pi * radius * (radius + height),
+                         math.pi * radius * radius * height)
+
+
+def sphere(radius):
+    return SurfaceVolume(4 * math.pi * radius * radius,
+                         (4 / 3) * math.pi * radius ** 3)
+
+
+def cone(radius, height):
+    l = (radius * radius + height * height) ** 0.5
+    return ConeResult(l, math.pi * radius * (radius + l),
+                      math.pi * radius * radius * height / 3)
+
+
+def hemisphere(radius):
+    return SurfaceVolume(3 * math.pi * radius * radius,
+                         (2 / 3) * math.pi * radius ** 3)
+
+
+def prism(base, base_height, height, a, b, c):
+    # Triangular prism: base triangle (base, base_height) with sides a, b, c
+    base_area = 0.5 * base * base_height
+    return SolidBaseResult(base_area, base_area * height,
+                           2 * base_area + (a + b + c) * height)
+
+
+def pyramid(side, height, slant_height):
+    # Square pyramid
+    base_area = side * side
+    return SolidBaseResult(base_area, (1 / 3) * base_area * height,
+                           base_area + 0.5 * (4 * side) * slant_height)
+
+
+# ================== Registry ==================
+
+# shape key -> (function, parameter names, result type)
+SHAPES = {
+    "circle": (circle, ("radius",), CircleResult),
+    "rectangle": (rectangle, ("length", "breadth"), AreaPerimeter),
+    "square": (square, ("side",), AreaPerimeter),
+    "rhombus": (rhombus, ("d1", "d2", "side"), AreaPerimeter),
+    "triangle": (triangle, ("base", "height", "a", "b", "c"), TriangleResult),
+    "pentagon": (pentagon, ("side", "apothem"), AreaPerimeter),
+    "trapezium": (trapezium, ("a", "b", "height", "c", "d"), AreaPerimeter),
+    "parallelogram": (parallelogram, ("base", "height", "side1", "side2"), AreaPerimeter),
+    "ellipse": (ellipse, ("a", "b"), AreaPerimeter),
+    "sector": (sector, ("radius", "angle"), SectorResult),
+    "parabola": (parabola, ("a",), ParabolaResult),
+    "cube": (cube, ("side",), SurfaceVolume),
+    "cuboid": (cuboid, ("length", "breadth", "height"), SurfaceVolume),
+    "cylinder": (cylinder, ("radius", "height"), SurfaceVolume),
+    "sphere": (sphere, ("radius",), SurfaceVolume),
+    "cone": (cone, ("radius", "height"), ConeResult),
+    "hemisphere": (hemisphere, ("radius",), SurfaceVolume),
+    "prism": (prism, ("base", "base_height", "height", "a", "b", "c"), SolidBaseResult),
+    "pyramid": (pyramid, ("side", "height", "slant_height"), SolidBaseResult),
+}
+
+
+def compute(shape, *args):
+    func = SHAPES[shape][0]
+    return func(*args)
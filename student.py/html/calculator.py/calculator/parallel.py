@@ -0,0 +1,262 @@
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import batch
+import geometry
+import vectorized
+
+
+# ================== Sharding ==================
+
+DEFAULT_SHARD_BYTES = 16 * 1024 * 1024
+COPY_BYTES = 1024 * 1024
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        line = f.readline()
+    header = next(csv.reader([line.decode("utf-8")]), [])
+    return [h.strip() for h in header], len(line)
+
+
+def plan_shards(path, shard_bytes=DEFAULT_SHARD_BYTES):
+    # Byte ranges over the data section; a shard owns every line that
+    # *starts* inside its range. Quoted fields spanning lines are not supported.
+    header, data_start = read_header(path)
+    size = os.path.getsize(path)
+    bounds = list(range(data_start, size, max(1, shard_bytes))) + [size]
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_shard_lines(f, start, end):
+    if start > 0:
+        # Skip the line that straddles the boundary; the previous shard owns it
+        f.seek(start - 1)
+        f.readline()
+    else:
+        f.seek(0)
+    pos = f.tell()
+    while pos < end:
+        line = f.readline()
+        if not line:
+            return
+        pos += len(line)
+        yield line
+
+
+def _iter_shard_rows(f, start, end):
+    lines = (line.decode("utf-8") for line in iter_shard_lines(f, start, end))
+    return csv.reader(lines)
+
+
+# ================== Pool ==================
+
+def ordered_results(pool, fn, jobs, window, discard=None):
+    # Runs fn(*job) on the pool for each job and yields (job, result) in job
+    # order, with at most `window` jobs in flight so memory stays flat. If
+    # the consumer stops early, jobs not yet started are cancelled and
+    # discard(result) releases whatever the finished ones hold (shared
+    # memory, temp files); the caller still owns results it was given.
+    pending = deque()
+    try:
+        for job in jobs:
+            pending.append((job, pool.submit(fn, *job)))
+            while len(pending) > window or (pending and pending[0][1].done()):
+                job, future = pending.popleft()
+                yield job, future.result()
+        while pending:
+            job, future = pending.popleft()
+            yield job, future.result()
+    finally:
+        for _, future in pending:
+            if future.cancel() or discard is None:
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            discard(result)
+
+
+def _pool(workers):
+    # Workers hand their shared memory over to the parent, so they must all
+    # report to the parent's resource tracker: started now, before any
+    # worker, it is the one they inherit. A segment still registered when
+    # the parent exits (after a crash, say) is unlinked by the tracker.
+    resource_tracker.ensure_running()
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+# ================== Workers ==================
+
+def _eval_shard(shape, path, start, end, indices, chunk_size):
+    _, params, _ = geometry.SHAPES[shape]
+    parts = []
+    with open(path, "rb") as f:
+        for rows in batch.iter_chunks(_iter_shard_rows(f, start, end), chunk_size):
+            columns = {}
+            for name, idx in zip(params, indices):
+                columns[name] = batch._parse_column(
+                    [row[idx] if idx < len(row) else "" for row in rows])
+            result = vectorized.compute(shape, **columns)
+            parts.append(np.vstack(list(result.values) + [result.valid]))
+
+    nrows = sum(p.shape[1] for p in parts)
+    if nrows == 0:
+        return None, 0
+    nfields = parts[0].shape[0]
+    # Result columns go back through shared memory rather than being pickled;
+    # the parent unlinks the segment after reading it
+    shm = shared_memory.SharedMemory(create=True, size=nfields * nrows * 8)
+    out = np.ndarray((nfields, nrows), dtype=np.float64, buffer=shm.buf)
+    col = 0
+    for p in parts:
+        out[:, col:col + p.shape[1]] = p
+        col += p.shape[1]
+    del out
+    shm.close()
+    return shm.name, nrows
+
+
+def _take_shm(name, shape):
+    # Copies a worker's result out of shared memory and unlinks it
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.float64, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _discard_shm(result):
+    name, _ = result
+    if name is not None:
+        shm = shared_memory.SharedMemory(name=name)
+        shm.close()
+        shm.unlink()
+
+
+def _write_shard(shape, path, start, end, indices, width, chunk_size, directory):
+    # Evaluates and formats a shard into its own file of output rows, so
+    # the parent only has to concatenate the files in order
+    _, params, _ = geometry.SHAPES[shape]
+    fd, out_path = tempfile.mkstemp(suffix=".csv", dir=directory)
+    with open(path, "rb") as f, open(fd, "w", newline="", encoding="utf-8") as out:
+        writer = csv.writer(out, lineterminator="\n")
+        rows = batch.write_chunks(writer, shape, params, indices, width,
+                                  _iter_shard_rows(f, start, end), chunk_size)
+    return out_path, rows
+
+
+def _discard_file(result):
+    os.remove(result[0])
+
+
+# ================== Merging ==================
+
+def _plan(shape, path, shard_bytes):
+    # (header, shards, column index of each shape parameter)
+    _, params, _ = geometry.SHAPES[shape]
+    header, shards = plan_shards(path, shard_bytes)
+    missing = [p for p in params if p not in header]
+    if missing:
+        raise ValueError(f"{shape}: input is missing column(s) {', '.join(missing)}")
+    return header, shards, [header.index(p) for p in params]
+
+
+def iter_shard_results(shape, path, workers=None, shard_bytes=DEFAULT_SHARD_BYTES,
+                       chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    # Yields (start, end, BatchResult) in file order
+    result_type = geometry.SHAPES[shape][2]
+    _, shards, indices = _plan(shape, path, shard_bytes)
+    workers = workers or os.cpu_count() or 1
+    nfields = len(result_type._fields) + 1
+    jobs = ((shape, path, start, end, indices, chunk_size) for start, end in shards)
+
+    with _pool(workers) as pool, closing(ordered_results(
+            pool, _eval_shard, jobs, 2 * workers, _discard_shm)) as results:
+        for (_, _, start, end, _, _), (name, nrows) in results:
+            if name is None:
+                continue
+            data = _take_shm(name, (nfields, nrows))
+            yield start, end, vectorized.BatchResult(result_type(*data[:-1]),
+                                                     data[-1].astype(bool))
+
+
+def evaluate(shape, path, workers=None, shard_bytes=DEFAULT_SHARD_BYTES,
+             chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    fields, valid = [], []
+    for _, _, result in iter_shard_results(shape, path, workers, shard_bytes, chunk_size):
+        fields.append(result.values)
+        valid.append(result.valid)
+    result_type = geometry.SHAPES[shape][2]
+    if not fields:
+        empty = np.empty(0, dtype=np.float64)
+        return vectorized.BatchResult(result_type(*[empty] * len(result_type._fields)),
+                                      np.empty(0, dtype=bool))
+    values = result_type(*(np.concatenate(col) for col in zip(*fields)))
+    return vectorized.BatchResult(values, np.concatenate(valid))
+
+
+def write_csv(shape, path, outfile, workers=None, shard_bytes=DEFAULT_SHARD_BYTES,
+              chunk_size=batch.DEFAULT_CHUNK_SIZE, progress=None):
+    # Same output as batch.run. Workers parse, evaluate and format their
+    # shards into temp files; the parent only copies those into outfile in
+    # order, so it never becomes the serial bottleneck.
+    result_type = geometry.SHAPES[shape][2]
+    header, shards, indices = _plan(shape, path, shard_bytes)
+    workers = workers or os.cpu_count() or 1
+    writer = csv.writer(outfile, lineterminator="\n")
+    writer.writerow(header + list(result_type._fields))
+    outfile.flush()
+    # Text files opened by batch._open (and sys.stdout) take the bytes as is
+    out = getattr(outfile, "buffer", None)
+
+    rows_done = 0
+    with tempfile.TemporaryDirectory(prefix="calculator-") as directory:
+        jobs = ((shape, path, start, end, indices, len(header), chunk_size, directory)
+                for start, end in shards)
+        with _pool(workers) as pool, closing(ordered_results(
+                pool, _write_shard, jobs, 2 * workers, _discard_file)) as results:
+            for _, (shard_path, rows) in results:
+                with open(shard_path, "rb") as shard:
+                    if out is not None:
+                        shutil.copyfileobj(shard, out, COPY_BYTES)
+                    else:
+                        outfile.write(shard.read().decode("utf-8"))
+                os.remove(shard_path)
+                rows_done += rows
+                if progress is not None:
+                    progress(rows_done)
+    if out is not None:
+        out.flush()
+    return rows_done
+
+
+# ================== Benchmark ==================
+
+def bench(path, shape="cone", max_workers=None, shard_bytes=4 * 1024 * 1024):
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({1, *[w for w in (2, 4, 8, 16, 32, 64) if w <= max_workers], max_workers})
+    base = None
+    for workers in counts:
+        start = time.perf_counter()
+        rows = len(evaluate(shape, path, workers, shard_bytes).valid)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print(f"workers={workers:3d}  {rows / elapsed:14,.0f} rows/s  "
+              f"speedup {base / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    bench(sys.argv[1], *sys.argv[2:3])
@@ -0,0 +1,59 @@
+import math
+
+
+# ================== 3D transform pipeline ==================
+
+FOV = 200
+DIST = 4
+
+
+def rotation_matrix(ax, ay, az):
+    # Rotation about X, then Y, then Z (same order the canvases always used),
+    # folded into one 3x3 matrix so each frame needs six trig calls in total.
+    cx, sx = math.cos(ax), math.sin(ax)
+    cy, sy = math.cos(ay), math.sin(ay)
+    cz, sz = math.cos(az), math.sin(az)
+    return (
+        (cy * cz, sx * sy * cz - cx * sz, cx * sy * cz + sx * sz),
+        (cy * sz, sx * sy * sz + cx * cz, cx * sy * sz - sx * cz),
+        (-sy, sx * cy, cx * cy),
+    )
+
+
+def transform(vertices, m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    return [(a * x + b * y + c * z, d * x + e * y + f * z, g * x + h * y + i * z)
+            for x, y, z in vertices]
+
+
+def project(vertices, m, width, height, fov=FOV, dist=DIST):
+    # Rotate and perspective-project every vertex in one pass
+    (a, b, c), (d, e, f), (g, h, i) = m
+    cx, cy = width / 2, height / 2
+    out = []
+    for x, y, z in vertices:
+        factor = fov / (dist + g * x + h * y + i * z)
+        out.append((cx + (a * x + b * y + c * z) * factor,
+                    cy - (d * x + e * y + f * z) * factor))
+    return out
+
+
+# ================== Meshes ==================
+
+def cube_mesh(s=1):
+    vertices = [
+        (-s, -s, -s),
+        ( s, -s, -s),
+        ( s,  s, -s),
+        (-s,  s, -s),
+        (-s, -s,  s),
+        ( s, -s,  s),
+        ( s,  s,  s),
+        (-s,  s,  s),
+    ]
+    edges = [
+        (0, 1), (1, 2), (2, 3), (3, 0),
+        (4, 5), (5, 6), (6, 7), (7, 4),
+        (0, 4), (1, 5), (2, 6), (3, 7)
+    ]
+    return vertices, edges
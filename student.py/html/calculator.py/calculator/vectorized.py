@@ -0,0 +1,103 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import geometry
+
+
+# ================== Batch API ==================
+
+# values: the shape's geometry result type with one array per field
+# valid:  boolean mask, False for rows whose inputs were missing/invalid
+BatchResult = namedtuple("BatchResult", "values valid")
+
+# Parameters that may legitimately be negative (everything else is a length)
+SIGNED_PARAMS = {("parabola", "a")}
+
+
+def _triangle(base, height, a, b, c):
+    # Same as geometry.triangle, with the Heron branch done element-wise
+    perimeter = a + b + c
+    s = perimeter / 2
+    val = s * (s - a) * (s - b) * (s - c)
+    area_heron = np.sqrt(np.where(val > 0, val, 0.0))
+    return geometry.TriangleResult(0.5 * base * height, perimeter, area_heron)
+
+
+# geometry functions that branch on scalars and need an array version
+_OVERRIDES = {"triangle": _triangle}
+
+
+def as_column(values):
+    # Accepts ndarrays, lists or anything exposing the buffer protocol
+    # (array.array, memoryview, bytes from a column store, ...)
+    return np.asarray(values, dtype=np.float64)
+
+
+def compute(shape, **columns):
+    func, params, result_type = geometry.SHAPES[shape]
+    missing = [p for p in params if p not in columns]
+    if missing:
+        raise ValueError(f"{shape}: missing column(s) {', '.join(missing)}")
+
+    cols = np.broadcast_arrays(*(as_column(columns[p]) for p in params))
+    valid = np.ones(cols[0].shape, dtype=bool)
+    for name, col in zip(params, cols):
+        valid &= np.isfinite(col)
+        if (shape, name) not in SIGNED_PARAMS:
+            valid &= col >= 0
+
+    func = _OVERRIDES.get(shape, func)
+    with np.errstate(all="ignore"):
+        values = func(*cols)
+
+    all_valid = bool(valid.all())
+    fields = []
+    for field in values:
+        if not all_valid:
+            field = np.where(valid, field, np.nan)
+        elif any(np.shares_memory(field, col) for col in cols):
+            # e.g. parabola.focus_x is the input column itself
+            field = field.copy()
+        fields.append(field)
+    return BatchResult(result_type(*fields), valid)
+
+
+# ================== Benchmark ==================
+
+# The batch API's goal: this many times the per-row loop's rows/s
+TARGET_SPEEDUP = 100
+
+
+def bench(shape="cone", rows=1_000_000, seed=0):
+    func, params, _ = geometry.SHAPES[shape]
+    rng = np.random.default_rng(seed)
+    cols = {p: rng.uniform(0.1, 100.0, rows) for p in params}
+
+    start = time.perf_counter()
+    compute(shape, **cols)
+    vec = time.perf_counter() - start
+
+    # The per-row loop is timed on a slice and scaled up
+    n = min(rows, 100_000)
+    lists = [cols[p][:n].tolist() for p in params]
+    start = time.perf_counter()
+    for row in zip(*lists):
+        func(*row)
+    loop = (time.perf_counter() - start) * rows / n
+
+    print(f"{shape}: {rows} rows")
+    print(f"  python loop : {rows / loop:14,.0f} rows/s")
+    speedup = loop / vec
+    print(f"  vectorized  : {rows / vec:14,.0f} rows/s  ({speedup:.0f}x)")
+    print(f"  target {TARGET_SPEEDUP}x: " + ("met" if speedup >= TARGET_SPEEDUP else
+                                         f"MISSED by {TARGET_SPEEDUP / speedup:.1f}x"))
+    return speedup
+
+
+if __name__ == "__main__":
+    import sys
+
+    for name in sys.argv[1:] or ("circle", "cuboid", "cone"):
+        bench(name)
@@ -0,0 +1,810 @@
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import OrderedDict, deque, namedtuple
+
+
+# ================== Stroke geometry ==================
+
+# Points are kept flat, [x0, y0, x1, y1, ...], which is also what
+# Canvas.coords() takes.
+
+def simplify(points, epsilon=1.0):
+    # Ramer–Douglas–Peucker, iterative so very long strokes cannot hit the
+    # recursion limit.
+    n = len(points) // 2
+    if n < 3:
+        return list(points)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    eps2 = epsilon * epsilon
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[2 * first], points[2 * first + 1]
+        bx, by = points[2 * last], points[2 * last + 1]
+        dx, dy = bx - ax, by - ay
+        seg2 = dx * dx + dy * dy
+        best, best_d2 = -1, eps2
+        for i in range(first + 1, last):
+            px, py = points[2 * i], points[2 * i + 1]
+            if seg2 == 0:
+                d2 = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                cross = dx * (py - ay) - dy * (px - ax)
+                d2 = cross * cross / seg2
+            if d2 > best_d2:
+                best, best_d2 = i, d2
+        if best >= 0:
+            keep[best] = True
+            stack.append((first, best))
+            stack.append((best, last))
+    out = []
+    for i in range(n):
+        if keep[i]:
+            out.append(points[2 * i])
+            out.append(points[2 * i + 1])
+    return out
+
+
+def far_enough(points, x, y, min_dist):
+    # Distance decimation while drawing: drop points closer than min_dist
+    # to the last kept one.
+    return math.hypot(x - points[-2], y - points[-1]) >= min_dist
+
+
+# ================== Eraser ==================
+
+def _circle_hit(ax, ay, bx, by, cx, cy, r):
+    # Parameter range [t0, t1] of segment A→B lying inside the circle,
+    # or None when the segment does not touch it.
+    dx, dy = bx - ax, by - ay
+    fx, fy = ax - cx, ay - cy
+    a = dx * dx + dy * dy
+    c = fx * fx + fy * fy - r * r
+    if a == 0:
+        return (0.0, 1.0) if c <= 0 else None
+    b = fx * dx + fy * dy
+    disc = b * b - a * c
+    if disc < 0:
+        return None
+    root = math.sqrt(disc)
+    t0, t1 = (-b - root) / a, (-b + root) / a
+    if t1 < 0 or t0 > 1:
+        return None
+    return max(t0, 0.0), min(t1, 1.0)
+
+
+def erase_polyline(points, cx, cy, r):
+    # Cut the part of a polyline inside the circle (cx, cy, r). Returns None
+    # if the stroke is untouched, otherwise the surviving pieces (possibly
+    # none), each a flat point list with at least two points.
+    pieces = []
+    cur = []
+    touched = False
+    for i in range(0, len(points) - 2, 2):
+        ax, ay, bx, by = points[i], points[i + 1], points[i + 2], points[i + 3]
+        hit = _circle_hit(ax, ay, bx, by, cx, cy, r)
+        if hit is None:
+            if not cur:
+                cur = [ax, ay]
+            cur += [bx, by]
+            continue
+        touched = True
+        t0, t1 = hit
+        dx, dy = bx - ax, by - ay
+        if t0 > 0:
+            if not cur:
+                cur = [ax, ay]
+            cur += [ax + t0 * dx, ay + t0 * dy]
+        if len(cur) >= 4:
+            pieces.append(cur)
+        cur = [ax + t1 * dx, ay + t1 * dy, bx, by] if t1 < 1 else []
+    if not touched:
+        return None
+    if len(cur) >= 4:
+        pieces.append(cur)
+    return pieces
+
+
+def rect_hits_circle(x0, y0, x1, y1, cx, cy, r):
+    nx = min(max(cx, x0), x1)
+    ny = min(max(cy, y0), y1)
+    return (nx - cx) ** 2 + (ny - cy) ** 2 <= r * r
+
+
+# ================== Spatial index ==================
+
+class SpatialGrid:
+    # Uniform grid over the board. A polyline is registered in every cell
+    # its segments' boxes touch (not its whole bounding box), so a query only
+    # sees strokes that actually pass near the point.
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}   # (col, row) -> set of ids
+        self.where = {}   # id -> set of (col, row)
+
+    def _span(self, x0, y0, x1, y1):
+        cs = self.cell_size
+        for col in range(int(x0 // cs), int(x1 // cs) + 1):
+            for row in range(int(y0 // cs), int(y1 // cs) + 1):
+                yield col, row
+
+    def _add(self, key, cells):
+        self.where.setdefault(key, set()).update(cells)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(key)
+
+    def insert_box(self, key, x0, y0, x1, y1):
+        self._add(key, set(self._span(x0, y0, x1, y1)))
+
+    def insert_polyline(self, key, points, pad=0.0):
+        cells = set()
+        for i in range(0, len(points) - 2, 2):
+            ax, ay, bx, by = points[i], points[i + 1], points[i + 2], points[i + 3]
+            cells.update(self._span(min(ax, bx) - pad, min(ay, by) - pad,
+                                    max(ax, bx) + pad, max(ay, by) + pad))
+        if len(points) == 2:
+            x, y = points
+            cells.update(self._span(x - pad, y - pad, x + pad, y + pad))
+        self._add(key, cells)
+
+    def remove(self, key):
+        for cell in self.where.pop(key, ()):
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.cells[cell]
+
+    def query(self, x0, y0, x1, y1):
+        found = set()
+        for cell in self._span(x0, y0, x1, y1):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found |= bucket
+        return found
+
+    def remap(self, mapping):
+        # Re-key entries (e.g. after the store is compacted); others are dropped
+        where = {mapping[key]: cells for key, cells in self.where.items() if key in mapping}
+        self.clear()
+        for key, cells in where.items():
+            self._add(key, cells)
+
+    def clear(self):
+        self.cells.clear()
+        self.where.clear()
+
+    def __len__(self):
+        return len(self.where)
+
+
+# ================== Stroke store ==================
+
+# The board's source of truth. Point data for every stroke lives in one flat
+# array('f'); per-item metadata is kept in parallel typed arrays indexed by
+# item id. Removing an item only clears its alive flag (its data stays, so
+# it can be revived by undo); compact() drops dead items.
+
+KIND_STROKE = 0
+KIND_TEXT = 1
+
+StrokeRecord = namedtuple("StrokeRecord", "kind points color width text")
+
+# File format: MAGIC followed by an append-only log of records
+#   b"S" color width:f32 n:u32 n*f32        stroke (n floats, x/y pairs)
+#   b"T" color x:f32 y:f32 len:u32 utf-8    text
+#   b"R" id:u32                             remove item
+#   b"U" id:u32                             revive a removed item (undo)
+#   b"C"                                    clear board
+# where color is len:u8 + utf-8. Item ids are implicit: the n-th add since
+# the last clear gets id n, in the file and in memory alike.
+MAGIC = b"WBD1"
+_U8 = struct.Struct("<B")
+_STROKE = struct.Struct("<fI")
+_TEXT = struct.Struct("<ffI")
+_U32 = struct.Struct("<I")
+
+
+class StrokeStore:
+    def __init__(self):
+        self.points = array("f")
+        self.offset = array("Q")   # start of the item's floats in points
+        self.length = array("I")   # number of floats
+        self.width = array("f")
+        self.color = array("H")    # index into self.colors
+        self.kind = array("B")
+        self.alive = bytearray()
+        self.colors = []
+        self.color_ids = {}
+        self.texts = {}            # id -> text, for KIND_TEXT items
+        self.live = 0
+        self.dead_bytes = 0        # data held by removed items
+        # Encoded records not yet on disk; None while the board has never
+        # been saved, so an unsaved board does not keep a second copy.
+        self.journal = None
+        self.truncated = False     # set by load() if the file had a torn tail
+
+    def __len__(self):
+        return self.live
+
+    def _log(self, record):
+        if self.journal is not None:
+            self.journal.append(record)
+
+    def _color_id(self, color):
+        cid = self.color_ids.get(color)
+        if cid is None:
+            cid = self.color_ids[color] = len(self.colors)
+            self.colors.append(color)
+        return cid
+
+    def _append(self, kind, coords, color, width):
+        sid = len(self.kind)
+        self.offset.append(len(self.points))
+        self.length.append(len(coords))
+        self.points.extend(coords)
+        self.width.append(width)
+        self.color.append(self._color_id(color))
+        self.kind.append(kind)
+        self.alive.append(1)
+        self.live += 1
+        return sid
+
+    def add_stroke(self, points, color, width):
+        coords = array("f", points)
+        sid = self._append(KIND_STROKE, coords, color, width)
+        if self.journal is not None:
+            c = color.encode("utf-8")
+            self._log(b"".join((b"S", _U8.pack(len(c)), c,
+                                _STROKE.pack(width, len(coords)), coords.tobytes())))
+        return sid
+
+    def add_text(self, x, y, text, color):
+        sid = self._append(KIND_TEXT, (x, y), color, 0.0)
+        self.texts[sid] = text
+        if self.journal is not None:
+            c, t = color.encode("utf-8"), text.encode("utf-8")
+            self._log(b"".join((b"T", _U8.pack(len(c)), c, _TEXT.pack(x, y, len(t)), t)))
+        return sid
+
+    def nbytes(self, sid):
+        # Approximate memory an item holds: points, metadata, text
+        return 4 * self.length[sid] + 24 + len(self.texts.get(sid, ""))
+
+    def _set_alive(self, sid, flag):
+        if self.alive[sid] == flag:
+            return False
+        self.alive[sid] = flag
+        self.live += 1 if flag else -1
+        self.dead_bytes += -self.nbytes(sid) if flag else self.nbytes(sid)
+        return True
+
+    def remove(self, sid):
+        if self._set_alive(sid, 0):
+            self._log(b"R" + _U32.pack(sid))
+
+    def revive(self, sid):
+        if self._set_alive(sid, 1):
+            self._log(b"U" + _U32.pack(sid))
+
+    def clear(self):
+        journal = self.journal
+        self.__init__()
+        self.journal = journal
+        self._log(b"C")
+
+    def is_alive(self, sid):
+        return sid < len(self.alive) and self.alive[sid] == 1
+
+    def ids(self):
+        return [sid for sid, flag in enumerate(self.alive) if flag]
+
+    def stroke_points(self, sid):
+        start = self.offset[sid]
+        return self.points[start:start + self.length[sid]]
+
+    def get(self, sid):
+        return StrokeRecord(self.kind[sid], self.stroke_points(sid),
+                            self.colors[self.color[sid]], self.width[sid],
+                            self.texts.get(sid))
+
+    def dead_ratio(self):
+        total = len(self.alive)
+        return (total - self.live) / total if total else 0.0
+
+    # ---------- persistence ----------
+    def compact(self, keep=()):
+        # Drop removed items except those in keep (e.g. still reachable by
+        # undo), which stay removed. Ids stay in order; returns
+        # {old id: new id} for everything retained. A journaling store's
+        # journal is re-encoded from scratch, so follow with save().
+        old = self
+        fresh = StrokeStore()
+        if old.journal is not None:
+            fresh.journal = []  # re-encodes every survivor
+        remap = {}
+        for sid, flag in enumerate(old.alive):
+            if not flag and sid not in keep:
+                continue
+            rec = old.get(sid)
+            if rec.kind == KIND_TEXT:
+                x, y = rec.points
+                new = fresh.add_text(x, y, rec.text, rec.color)
+            else:
+                new = fresh.add_stroke(rec.points, rec.color, rec.width)
+            if not flag:
+                fresh.remove(new)
+            remap[sid] = new
+        self.__dict__.update(fresh.__dict__)
+        return remap
+
+    def save(self, path, keep=()):
+        # Full rewrite (compacting first); later changes can be appended
+        self.journal = []
+        remap = self.compact(keep)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.writelines(self.journal)
+        os.replace(tmp, path)
+        self.journal = []
+        return remap
+
+    def append_journal(self, path):
+        # Incremental save: only what changed since the last write
+        if not self.journal:
+            self.journal = []
+            return 0
+        written = sum(len(rec) for rec in self.journal)
+        with open(path, "ab") as f:
+            f.writelines(self.journal)
+        self.journal = []
+        return written
+
+    def _replay(self, data, view, pos):
+        # Apply one record; returns the (possibly new) store and next offset.
+        # Nothing is applied unless the whole record is present.
+        tag = data[pos:pos + 1]
+        pos += 1
+        if tag == b"S" or tag == b"T":
+            (clen,) = _U8.unpack_from(data, pos)
+            color = bytes(view[pos + 1:pos + 1 + clen]).decode("utf-8")
+            pos += 1 + clen
+            if tag == b"S":
+                width, n = _STROKE.unpack_from(data, pos)
+                pos += _STROKE.size
+                if pos + 4 * n > len(data):
+                    raise ValueError("truncated stroke")
+                coords = array("f")
+                coords.frombytes(view[pos:pos + 4 * n])
+                self._append(KIND_STROKE, coords, color, width)
+                return self, pos + 4 * n
+            x, y, tlen = _TEXT.unpack_from(data, pos)
+            pos += _TEXT.size
+            if pos + tlen > len(data):
+                raise ValueError("truncated text")
+            text = bytes(view[pos:pos + tlen]).decode("utf-8")
+            self.texts[self._append(KIND_TEXT, (x, y), color, 0.0)] = text
+            return self, pos + tlen
+        if tag == b"R" or tag == b"U":
+            (sid,) = _U32.unpack_from(data, pos)
+            self._set_alive(sid, 1 if tag == b"U" else 0)
+            return self, pos + _U32.size
+        if tag == b"C":
+            return type(self)(), pos
+        raise ValueError(f"unknown record {tag!r}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path}: not a whiteboard file")
+        store = cls()
+        view = memoryview(data)
+        pos, end = 4, len(data)
+        while pos < end:
+            try:
+                store, pos = store._replay(data, view, pos)
+            except (struct.error, IndexError, UnicodeDecodeError, ValueError):
+                # A torn write at the end of an autosave: keep what we have
+                break
+        # Appending after a torn tail would be unreadable; callers rewrite
+        store.truncated = pos < end
+        store.journal = []
+        return store
+
+
+# ================== Undo history ==================
+
+# A command is a delta against the StrokeStore: the ids it added and the ids
+# it removed. Undo removes the added ones and revives the removed ones; redo
+# does the opposite. Neither copies stroke data, so a step costs only the
+# items it touches (one for a pen stroke).
+#
+# nbytes is the store data a command keeps reachable. When the commands'
+# total exceeds the budget the oldest are dropped; data that only they
+# referenced becomes garbage for the next StrokeStore.compact().
+
+Command = namedtuple("Command", "added removed nbytes")
+
+
+class History:
+    def __init__(self, budget=8 * 1024 * 1024):
+        self.budget = budget
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.nbytes = 0
+        self._added = None    # command being recorded: ordered set of ids
+        self._removed = None
+
+    def begin(self):
+        if self._added is None:
+            self._added, self._removed = {}, []
+
+    def added(self, sid):
+        self.begin()
+        self._added[sid] = None
+
+    def removed(self, sid):
+        self.begin()
+        if sid in self._added:
+            # Created and erased within one command: it simply never existed
+            del self._added[sid]
+        else:
+            self._removed.append(sid)
+
+    def commit(self, store):
+        added, removed = self._added, self._removed
+        self._added = self._removed = None
+        if not added and not removed:
+            return None
+        cmd = Command(array("I", added), array("I", removed),
+                      sum(store.nbytes(sid) for sid in (*added, *removed)))
+        # A new command forks history: what could be redone is garbage now
+        self.nbytes -= sum(c.nbytes for c in self.redo_stack)
+        self.redo_stack.clear()
+        self.undo_stack.append(cmd)
+        self.nbytes += cmd.nbytes
+        while self.nbytes > self.budget and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft().nbytes
+        return cmd
+
+    def undo(self):
+        # Returns (ids to remove, ids to revive), or None
+        if not self.undo_stack:
+            return None
+        cmd = self.undo_stack.pop()
+        self.redo_stack.append(cmd)
+        return cmd.added, cmd.removed
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        cmd = self.redo_stack.pop()
+        self.undo_stack.append(cmd)
+        return cmd.removed, cmd.added
+
+    def referenced(self):
+        ids = set()
+        for cmd in (*self.undo_stack, *self.redo_stack):
+            ids.update(cmd.added)
+            ids.update(cmd.removed)
+        return ids
+
+    def garbage(self, store):
+        # Estimate of removed data no command can bring back
+        return store.dead_bytes - self.nbytes
+
+    def remap(self, mapping):
+        # After the store is compacted with keep=referenced()
+        def fix(cmd):
+            return cmd._replace(added=array("I", (mapping[s] for s in cmd.added)),
+                                removed=array("I", (mapping[s] for s in cmd.removed)))
+        self.undo_stack = deque(fix(cmd) for cmd in self.undo_stack)
+        self.redo_stack = [fix(cmd) for cmd in self.redo_stack]
+
+    def clear(self):
+        self.__init__(self.budget)
+
+
+# ================== Raster tiles ==================
+
+# Finished strokes are drawn into fixed-size RGB tiles per zoom level. A tile
+# key is (level, tx, ty) and covers level pixels [tx*TILE, (tx+1)*TILE) where
+# a level pixel is a board unit times zoom_scale(level).
+
+TILE = 256
+STEP_SEGMENTS = 4096  # segments per TileRenderer.step, a few ms
+MIN_ZOOM, MAX_ZOOM = -6, 6
+BACKGROUND = (255, 255, 255)
+
+
+def zoom_scale(level):
+    # Half-octave steps: two wheel clicks double the size
+    return 2.0 ** (level / 2)
+
+
+def bbox(points, pad=0.0):
+    xs, ys = points[0::2], points[1::2]
+    return min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad
+
+
+def tile_overlaps(key, x0, y0, x1, y1):
+    # Whether a tile overlaps a rectangle given in board units
+    level, tx, ty = key
+    s = TILE / zoom_scale(level)
+    return tx * s <= x1 and (tx + 1) * s >= x0 and ty * s <= y1 and (ty + 1) * s >= y0
+
+
+def tiles_in_rect(level, x0, y0, x1, y1):
+    # Keys of the tiles overlapping a rectangle given in level pixels
+    return [(level, tx, ty)
+            for ty in range(math.floor(y0 / TILE), math.floor(y1 / TILE) + 1)
+            for tx in range(math.floor(x0 / TILE), math.floor(x1 / TILE) + 1)]
+
+
+def _capsule_spans(size, ax, ay, bx, by, r):
+    # Pixel spans of the capsules (every pixel whose centre lies within r of
+    # segment A->B), for arrays of segments in tile pixels. A capsule is
+    # convex, so each row is one span: the hull of the two end-cap spans and
+    # the span of the band between them. Returns (segment, row, x0, x1) per
+    # row with x0 <= x1. NumPy is only imported with the first tile.
+    import numpy as np
+
+    row0 = np.maximum(0, np.floor(np.minimum(ay, by) - r)).astype(np.intp)
+    row1 = np.minimum(size - 1, np.ceil(np.maximum(ay, by) + r)).astype(np.intp)
+    counts = np.maximum(row1 - row0 + 1, 0)
+    seg = np.repeat(np.arange(len(ax)), counts)
+    rows = np.arange(len(seg)) - np.repeat(np.cumsum(counts) - counts, counts) + row0[seg]
+    ax, ay, bx, by, r = ax[seg], ay[seg], bx[seg], by[seg], r[seg]
+    yc = rows + 0.5
+    lo = np.full(len(seg), np.inf)
+    hi = np.full(len(seg), -np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for cx, cy in ((ax, ay), (bx, by)):
+            h2 = r * r - (yc - cy) ** 2
+            h = np.sqrt(np.where(h2 >= 0, h2, np.nan))
+            lo = np.fmin(lo, cx - h)
+            hi = np.fmax(hi, cx + h)
+        dx, dy = bx - ax, by - ay
+        length = np.hypot(dx, dy)
+        ry = yc - ay
+        # Sloped band: |cross| <= r*length bounds x from one side, 0 <= t <= 1
+        # from the other (only for dx != 0; for dx == 0 it is a test on ry)
+        u0 = (dx * ry - r * length) / dy
+        u1 = (dx * ry + r * length) / dy
+        blo, bhi = np.minimum(u0, u1), np.maximum(u0, u1)
+        t0 = -ry * dy / dx
+        t1 = (length * length - ry * dy) / dx
+        sloped = dx != 0
+        blo = np.where(sloped, np.maximum(blo, np.minimum(t0, t1)), blo)
+        bhi = np.where(sloped, np.minimum(bhi, np.maximum(t0, t1)), bhi)
+        t = ry / dy
+        band = (length > 0) & (dy != 0) & (blo <= bhi) & (sloped | ((t >= 0) & (t <= 1)))
+        lo = np.where(band, np.fmin(lo, ax + blo), lo)
+        hi = np.where(band, np.fmax(hi, ax + bhi), hi)
+        # Horizontal band: the segment's x range, or nothing
+        flat = (length > 0) & (dy == 0) & (np.abs(ry) <= r)
+        lo = np.where(flat, np.fmin(lo, np.minimum(ax, bx)), lo)
+        hi = np.where(flat, np.fmax(hi, np.maximum(ax, bx)), hi)
+        x0 = np.maximum(0, np.ceil(lo - 0.5))
+        x1 = np.minimum(size - 1, np.floor(hi - 0.5))
+    keep = x0 <= x1
+    return seg[keep], rows[keep], x0[keep].astype(np.intp), x1[keep].astype(np.intp)
+
+
+class TileRenderer:
+    # Rasterizes one tile a batch of strokes at a time, so a caller with a
+    # time budget can stop between batches and carry on in a later pass.
+    # The tile's strokes are copied out of the store up front: any edit
+    # under the tile makes the caller start again. Within a batch all
+    # segments become row spans in one vectorized pass, and each run of
+    # strokes of one colour is painted as one mask, in stroke order, so
+    # later strokes still cover earlier ones.
+    def __init__(self, store, index, key, rgb_of, size=TILE):
+        # rgb_of maps a colour string to an (r, g, b) tuple
+        import numpy as np
+
+        level, tx, ty = key
+        scale = zoom_scale(level)
+        ox, oy = tx * size, ty * size
+        x0, y0 = ox / scale, oy / scale
+        x1, y1 = (ox + size) / scale, (oy + size) / scale
+        sids = [sid for sid in sorted(index.query(x0, y0, x1, y1))
+                if store.is_alive(sid) and store.kind[sid] == KIND_STROKE and store.length[sid]]
+        self.size = size
+        self.image = None
+        self.done = 0  # strokes painted so far
+        self.count = len(sids)
+        if not sids:
+            return
+        flat = np.frombuffer(store.points, dtype=np.float32)
+        coords = np.concatenate([flat[store.offset[sid]:store.offset[sid] + store.length[sid]]
+                                 for sid in sids]).astype(np.float64)
+        del flat  # store.points must stay resizable
+        self.xs, self.ys = coords[0::2] * scale - ox, coords[1::2] * scale - oy
+        self.lens = np.array([store.length[sid] // 2 for sid in sids], dtype=np.intp)
+        self.starts = np.cumsum(self.lens) - self.lens
+        # A lone point is drawn as a zero-length segment
+        self.nseg = np.maximum(self.lens - 1, 1)
+        self.seg_end = np.cumsum(self.nseg)
+        self.radius = np.maximum(0.6, np.array([store.width[sid] for sid in sids]) * scale / 2)
+        self.colors = [store.color[sid] for sid in sids]
+        self.rgb = {cid: rgb_of(store.colors[cid]) for cid in set(self.colors)}
+
+    def step(self, segments=STEP_SEGMENTS):
+        # Paints the next strokes, about `segments` segments' worth (at
+        # least one stroke); returns True once the tile is complete
+        import numpy as np
+
+        if self.done >= self.count:
+            return True
+        first = self.done
+        painted = self.seg_end[first - 1] if first else 0
+        last = max(first + 1, int(np.searchsorted(self.seg_end, painted + segments, "right")))
+        self.done = last = min(last, self.count)
+
+        nseg = self.nseg[first:last]
+        stroke = np.repeat(np.arange(first, last), nseg)
+        a = (np.repeat(self.starts[first:last], nseg) + np.arange(len(stroke))
+             - np.repeat(np.cumsum(nseg) - nseg, nseg))
+        b = a + (self.lens[stroke] > 1)
+        xs, ys, size = self.xs, self.ys, self.size
+        ax, ay, bx, by, r = xs[a], ys[a], xs[b], ys[b], self.radius[stroke]
+        near = ((np.minimum(ax, bx) - r <= size) & (np.maximum(ax, bx) + r >= 0)
+                & (np.minimum(ay, by) - r <= size) & (np.maximum(ay, by) + r >= 0))
+        stroke = stroke[near]
+        seg, rows, x0, x1 = _capsule_spans(size, ax[near], ay[near], bx[near], by[near], r[near])
+        if not len(seg):
+            return self.done >= self.count
+        stroke = stroke[seg]
+        if self.image is None:
+            self.image = np.empty((size, size, 3), dtype=np.uint8)
+            self.image[:] = BACKGROUND
+        # Runs of consecutive strokes sharing a colour, in stroke order
+        colors = self.colors
+        breaks = [i for i in range(first + 1, last) if colors[i] != colors[i - 1]]
+        width = size + 1
+        cells = size * width
+        for lo, hi in zip([first] + breaks, breaks + [last]):
+            mine = (stroke >= lo) & (stroke < hi)
+            if not mine.any():
+                continue
+            # +1 where a span starts, -1 just past its end: a running sum
+            # along each row is then > 0 exactly on covered pixels
+            edges = (np.bincount(rows[mine] * width + x0[mine], minlength=cells)
+                     - np.bincount(rows[mine] * width + x1[mine] + 1, minlength=cells))
+            mask = np.cumsum(edges.reshape(size, width), axis=1)[:, :size] > 0
+            self.image[mask] = self.rgb[colors[lo]]
+        return self.done >= self.count
+
+    def data(self):
+        # Binary PPM data, or None for a tile with nothing on it (the canvas
+        # background shows)
+        if self.image is None:
+            return None
+        return b"P6 %d %d 255\n" % (self.size, self.size) + self.image.tobytes()
+
+
+def render_tile(store, index, key, rgb_of, size=TILE):
+    # A whole tile in one call (see TileRenderer)
+    renderer = TileRenderer(store, index, key, rgb_of, size)
+    while not renderer.step():
+        pass
+    return renderer.data()
+
+
+class TileCache:
+    # LRU of rendered tiles keyed by (level, tx, ty). Values are whatever the
+    # caller stores (a PhotoImage, or None for a blank tile).
+    def __init__(self, capacity=192):
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def get(self, key):
+        value = self.tiles[key]
+        self.tiles.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        # Returns the keys evicted to make room
+        self.tiles[key] = value
+        self.tiles.move_to_end(key)
+        evicted = []
+        while len(self.tiles) > self.capacity:
+            evicted.append(self.tiles.popitem(last=False)[0])
+        return evicted
+
+    def invalidate(self, x0, y0, x1, y1):
+        # Drop every cached tile, at any level, overlapping a board rectangle
+        dropped = []
+        for key in list(self.tiles):
+            if tile_overlaps(key, x0, y0, x1, y1):
+                del self.tiles[key]
+                dropped.append(key)
+        return dropped
+
+    def clear(self):
+        self.tiles.clear()
+
+    def __len__(self):
+        return len(self.tiles)
+
+
+# ================== Benchmark ==================
+
+def bench(total_points=1_000_000, per_stroke=200):
+    import random
+    import tempfile
+
+    store = StrokeStore()
+    for _ in range(total_points // per_stroke):
+        # Pen-like random walks scattered over a 4000x4000 board
+        x, y = random.uniform(0, 4000), random.uniform(0, 4000)
+        pts = []
+        for _ in range(per_stroke):
+            x += random.uniform(-3, 3)
+            y += random.uniform(-3, 3)
+            pts += [x, y]
+        store.add_stroke(pts, "black", 2.0)
+    path = os.path.join(tempfile.mkdtemp(), "board.wbd")
+
+    start = time.perf_counter()
+    store.save(path)
+    saved = time.perf_counter() - start
+
+    store.add_stroke(pts, "red", 3.0)
+    start = time.perf_counter()
+    appended = store.append_journal(path)
+    append_t = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = StrokeStore.load(path)
+    load_t = time.perf_counter() - start
+
+    print(f"{len(loaded)} strokes, {len(loaded.points) // 2:,} points, "
+          f"{os.path.getsize(path) / 1e6:.1f} MB")
+    print(f"  full save   {saved * 1000:8.1f} ms")
+    print(f"  autosave    {append_t * 1000:8.1f} ms ({appended} bytes)")
+    print(f"  load        {load_t * 1000:8.1f} ms")
+
+    # Cold render of a 1920x1080 view from the loaded board
+    index = SpatialGrid()
+    for sid in loaded.ids():
+        index.insert_polyline(sid, loaded.stroke_points(sid), pad=loaded.width[sid] / 2)
+    keys = tiles_in_rect(0, 0, 0, 1920, 1080)
+    start = time.perf_counter()
+    for key in keys:
+        render_tile(loaded, index, key, lambda color: (0, 0, 0))
+    tiles_t = time.perf_counter() - start
+    print(f"  view tiles  {tiles_t * 1000:8.1f} ms ({len(keys)} tiles, "
+          f"{tiles_t * 1000 / len(keys):.1f} ms each)")
+
+    # Fully zoomed out, every stroke lands in a few tiles: what matters to
+    # the UI is the longest single step, not the whole tile
+    keys = tiles_in_rect(MIN_ZOOM, 0, 0, 4000, 4000)
+    worst = total = 0.0
+    for key in keys:
+        renderer = TileRenderer(loaded, index, key, lambda color: (0, 0, 0))
+        done = False
+        while not done:
+            start = time.perf_counter()
+            done = renderer.step()
+            elapsed = time.perf_counter() - start
+            worst = max(worst, elapsed)
+            total += elapsed
+    print(f"  zoomed out  {total * 1000:8.1f} ms ({len(keys)} tiles, "
+          f"longest step {worst * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    bench(*(int(a) for a in sys.argv[1:3]))